@@ -0,0 +1,199 @@
+"""Admission control of the lines published to the dubbers."""
+
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import traceback
+from typing import List, Optional
+
+GEMINI_TOKENS = "gemini_tokens"
+GOOGLE_TTS_CHARACTERS = "google_tts_characters"
+ELEVENLABS_CHARACTERS = "elevenlabs_characters"
+
+# Default per-minute quotas of the APIs called by the dubbers. They can be
+# overridden with the GEMINI_TOKENS_PER_MINUTE,
+# GOOGLE_TTS_CHARACTERS_PER_MINUTE and ELEVENLABS_CHARACTERS_PER_MINUTE
+# environment variables, 0 disabling the quota.
+DEFAULT_QUOTAS_PER_MINUTE = {
+    GEMINI_TOKENS: 4_000_000,
+    GOOGLE_TTS_CHARACTERS: 1_000_000,
+    ELEVENLABS_CHARACTERS: 100_000,
+}
+
+# Metric of the number of messages waiting in a subscription, and how far
+# back its latest value is looked for.
+BACKLOG_METRIC = "pubsub.googleapis.com/subscription/num_undelivered_messages"
+BACKLOG_LOOKBACK_SECONDS = 300
+
+
+class Budget:
+  """Per-minute budget of an API, reserved ahead of its use.
+
+  The budget is a token bucket holding up to a minute of quota. Reservations
+  take their tokens right away, leaving the bucket in debt when they don't
+  fit, and are delayed until the bucket would have refilled.
+  """
+
+  def __init__(self, per_minute: float):
+    """Initializes a full budget.
+
+    Args:
+      per_minute: The quota of the API per minute.
+    """
+    self.rate_per_second = per_minute / 60
+    self.capacity = per_minute
+    self._tokens = float(per_minute)
+    self._updated_at = time.monotonic()
+
+  def delay(self, amount: float) -> float:
+    """Returns the number of seconds before an amount can be used."""
+    self._refill()
+    return max(0.0, (amount - self._tokens) / self.rate_per_second)
+
+  def take(self, amount: float) -> None:
+    """Reserves an amount of the budget, possibly going into debt."""
+    self._refill()
+    self._tokens -= amount
+
+  def _refill(self) -> None:
+    """Adds the tokens earned since the last update."""
+    now = time.monotonic()
+    self._tokens = min(
+        self.capacity,
+        self._tokens + (now - self._updated_at) * self.rate_per_second,
+    )
+    self._updated_at = now
+
+
+class AdmissionController:
+  """Plans the start of the lines of a run within the quotas of the APIs.
+
+  Every line reserves its estimated API usage from the budget of each API,
+  and gets the time it can start without exceeding any of them. The messages
+  already waiting for a dubber are charged to the budgets first, as if they
+  used as much as the first line with an estimate.
+  """
+
+  def __init__(
+      self,
+      quotas_per_minute: dict[str, float],
+      horizon_seconds: float,
+      backlog_messages: int = 0,
+  ):
+    """Initializes the controller.
+
+    Args:
+      quotas_per_minute: The quota per minute of every API, as returned by
+        quotas_per_minute.
+      horizon_seconds: The number of seconds from now the lines can be
+        planned to start in.
+      backlog_messages: The number of messages waiting for a dubber.
+    """
+    self._budgets = {
+        api: Budget(quota) for api, quota in quotas_per_minute.items() if quota
+    }
+    self._deadline = time.monotonic() + horizon_seconds
+    self._backlog_messages = backlog_messages
+
+  def reserve(self, usage: dict[str, float]) -> Optional[float]:
+    """Plans the start of a line.
+
+    Args:
+      usage: The estimated usage of every API by the line.
+
+    Returns:
+      The time.monotonic() time the line can start at, or None if it's past
+      the horizon, in which case nothing is reserved.
+    """
+    if self._backlog_messages and any(usage.values()):
+      for api, budget in self._budgets.items():
+        budget.take(usage.get(api, 0) * self._backlog_messages)
+      self._backlog_messages = 0
+
+    delay = max(
+        (
+            budget.delay(usage.get(api, 0))
+            for api, budget in self._budgets.items()
+        ),
+        default=0.0,
+    )
+    start = time.monotonic() + delay
+    if start > self._deadline:
+      return None
+
+    for api, budget in self._budgets.items():
+      budget.take(usage.get(api, 0))
+    return start
+
+
+def quotas_per_minute() -> dict[str, float]:
+  """Returns the quota per minute of every API, 0 when it's not limited."""
+  return {
+      api: float(os.environ.get(f"{api.upper()}_PER_MINUTE", quota))
+      for api, quota in DEFAULT_QUOTAS_PER_MINUTE.items()
+  }
+
+
+def backlog_messages(project_id: str, subscription_ids: List[str]) -> int:
+  """Returns the number of messages waiting in some subscriptions.
+
+  The latest value of BACKLOG_METRIC is read from Cloud Monitoring. The
+  backlog is considered empty when it can't be read.
+
+  Args:
+    project_id: Google Cloud project ID.
+    subscription_ids: The IDs of the subscriptions of the dubbers.
+
+  Returns:
+    The total number of undelivered messages of the subscriptions.
+  """
+  if not subscription_ids:
+    return 0
+
+  try:
+    # Imported on first use, as it's slow to load and only needed when the
+    # subscriptions are set.
+    from google.cloud import monitoring_v3  # pylint: disable=g-import-not-at-top
+
+    now = int(time.time())
+    subscriptions = ", ".join(
+        f'"{subscription_id}"' for subscription_id in subscription_ids
+    )
+    time_series = monitoring_v3.MetricServiceClient().list_time_series(
+        request={
+            "name": f"projects/{project_id}",
+            "filter": (
+                f'metric.type = "{BACKLOG_METRIC}" AND'
+                f" resource.labels.subscription_id = one_of({subscriptions})"
+            ),
+            "interval": {
+                "start_time": {"seconds": now - BACKLOG_LOOKBACK_SECONDS},
+                "end_time": {"seconds": now},
+            },
+            "view": monitoring_v3.ListTimeSeriesRequest.TimeSeriesView.FULL,
+        }
+    )
+    # The points of a time series are returned newest first.
+    return sum(
+        series.points[0].value.int64_value
+        for series in time_series
+        if series.points
+    )
+  except Exception:
+    traceback.print_exc()
+    return 0
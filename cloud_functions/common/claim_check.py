@@ -0,0 +1,93 @@
+"""Claim checks of the large messages sent to the dubbers."""
+
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import os
+from typing import Optional
+import state_store
+
+# Messages larger than this many bytes are replaced by a claim check. It can be
+# overridden with the CLAIM_CHECK_THRESHOLD_BYTES environment variable.
+DEFAULT_THRESHOLD_BYTES = 32 * 1024
+
+# Prefix of the keys of the claim checked messages in the state store.
+PAYLOADS_PREFIX = "payloads/"
+
+# Keys of a claim check message.
+URI_KEY = "claim_check_uri"
+SHA256_KEY = "claim_check_sha256"
+
+
+def threshold_bytes() -> int:
+  """Returns the size from which messages are replaced by a claim check."""
+  return int(
+      os.environ.get("CLAIM_CHECK_THRESHOLD_BYTES", DEFAULT_THRESHOLD_BYTES)
+  )
+
+
+def check_in(data: bytes, store: Optional[state_store.StateStore]) -> bytes:
+  """Replaces a large message by a claim check.
+
+  The message is written to the state store under a key derived from its
+  content, so identical messages are stored only once, and the claim check
+  carries its URI and its SHA-256 checksum.
+
+  Args:
+    data: The message to send.
+    store: The state store to write large messages to. Messages are sent as
+      they are when there is none.
+
+  Returns:
+    The message itself if it's small enough, its claim check otherwise.
+  """
+  if not store or len(data) <= threshold_bytes():
+    return data
+
+  checksum = hashlib.sha256(data).hexdigest()
+  key = f"{PAYLOADS_PREFIX}{checksum}.json"
+  store.write(key, data)
+  return bytes(
+      json.dumps({URI_KEY: store.uri(key), SHA256_KEY: checksum}), "utf-8"
+  )
+
+
+def check_out(data: bytes) -> bytes:
+  """Returns the message a claim check stands for.
+
+  Args:
+    data: A message, as returned by check_in.
+
+  Returns:
+    The message read from the state store if data is a claim check, data
+    itself otherwise.
+
+  Raises:
+    ValueError: If the stored message is missing or doesn't match the
+      checksum of the claim check.
+  """
+  message = json.loads(data)
+  if not isinstance(message, dict) or URI_KEY not in message:
+    return data
+
+  stored = state_store.read_uri(message[URI_KEY])
+  if stored is None:
+    raise ValueError(f"Missing claim checked message {message[URI_KEY]}")
+  if hashlib.sha256(stored).hexdigest() != message[SHA256_KEY]:
+    raise ValueError(f"Checksum mismatch of {message[URI_KEY]}")
+  return stored
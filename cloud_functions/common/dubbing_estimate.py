@@ -0,0 +1,154 @@
+"""Estimates of the time and the API usage of dubbing a line."""
+
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# -*- coding: utf-8 -*-
+
+import os
+from typing import Any, Optional
+import row_schema
+
+VOICE_PROVIDER_ELEVENLABS = "ElevenLabs"
+
+# Timeout of the dubbers when the DUBBER_TIMEOUT_SECONDS environment variable
+# is not set.
+DEFAULT_DUBBER_TIMEOUT_SECONDS = 540
+
+# The figures below are rough averages of the dubbers, to be tuned with the
+# timings they report.
+
+# Seconds spent by every Dubber before dubbing: downloading the video and
+# loading the models. Every language gets its own Dubber, unless the lines
+# are coalesced.
+SETUP_SECONDS = 60.0
+
+# Seconds spent per second of video on every language after the first one
+# when the languages are dubbed by the same Dubber, which reuses the separated
+# vocals and the transcription: translating and mixing.
+REDUB_SECONDS_PER_SECOND = 1.0
+
+# Seconds spent per second of video on every language dubbed from the video:
+# separating the vocals, transcribing, diarizing and mixing.
+VIDEO_SECONDS_PER_SECOND = 3.0
+
+# Additional seconds per second of video for every speaker after the first.
+SPEAKER_SECONDS_PER_SECOND = 0.5
+
+# Seconds of speech synthesis per character, for every voice provider.
+TTS_SECONDS_PER_CHARACTER = {"Google": 0.005, VOICE_PROVIDER_ELEVENLABS: 0.02}
+
+# Seconds spent cloning the voice of every speaker with ElevenLabs.
+VOICE_CLONING_SECONDS = 30.0
+
+# Characters spoken per second of video, for the lines dubbed from the video.
+SPEECH_CHARACTERS_PER_SECOND = 15
+
+# Gemini tokens per second of audio, per character of text and of the
+# instructions sent with the requests of every language.
+AUDIO_TOKENS_PER_SECOND = 32
+TOKENS_PER_CHARACTER = 0.25
+PROMPT_TOKENS = 1000
+
+
+def timeout_seconds() -> int:
+  """Returns the timeout of the dubbers."""
+  return int(
+      os.environ.get("DUBBER_TIMEOUT_SECONDS", DEFAULT_DUBBER_TIMEOUT_SECONDS)
+  )
+
+
+def estimate(
+    row: row_schema.DubbingRow,
+    duration_seconds: Optional[float] = None,
+    reuse_transcription: bool = False,
+) -> Optional[dict[str, Any]]:
+  """Estimates the time and the API usage of dubbing a line.
+
+  Args:
+    row: The typed configuration of the line.
+    duration_seconds: The duration of the video of the line, if known. It's
+      not needed for the lines dubbed from a script.
+    reuse_transcription: Whether the languages of a line dubbed from the video
+      are all dubbed by the same Dubber, which prepares and transcribes the
+      video once.
+
+  Returns:
+    A dictionary with the dubbing "seconds" of all the languages and the
+    "seconds_per_language", and the number of "gemini_tokens" and
+    "tts_characters" used, or None if the duration of the video is not known
+    for a line dubbed from the video.
+  """
+  characters = _script_characters(row.script) if row.script else None
+  if characters is None:
+    if not duration_seconds:
+      return None
+    characters = duration_seconds * SPEECH_CHARACTERS_PER_SECOND
+
+  use_elevenlabs = VOICE_PROVIDER_ELEVENLABS in row.voice_provider
+  tts_seconds_per_character = TTS_SECONDS_PER_CHARACTER[
+      VOICE_PROVIDER_ELEVENLABS if use_elevenlabs else "Google"
+  ]
+  # Translating the text, and checking the translation with verification.
+  text_tokens = 2 * characters * TOKENS_PER_CHARACTER
+  if row.with_verification:
+    text_tokens *= 2
+
+  # Time and tokens spent once per Dubber, and on every language.
+  setup_seconds = SETUP_SECONDS
+  setup_tokens = 0
+  language_seconds = characters * tts_seconds_per_character
+  language_tokens = PROMPT_TOKENS + text_tokens
+  if not row.script:
+    setup_seconds += duration_seconds * (
+        VIDEO_SECONDS_PER_SECOND
+        + SPEAKER_SECONDS_PER_SECOND * max(row.number_of_speakers - 1, 0)
+    )
+    setup_tokens += duration_seconds * AUDIO_TOKENS_PER_SECOND
+    if use_elevenlabs and row.clone_original_voices:
+      language_seconds += VOICE_CLONING_SECONDS * row.number_of_speakers
+
+  languages = len(row.target_language)
+  seconds_per_language = setup_seconds + language_seconds
+  if reuse_transcription and not row.script:
+    seconds = seconds_per_language + (languages - 1) * (
+        language_seconds + duration_seconds * REDUB_SECONDS_PER_SECOND
+    )
+    tokens = setup_tokens + language_tokens * languages
+  else:
+    seconds = seconds_per_language * languages
+    tokens = (setup_tokens + language_tokens) * languages
+  return {
+      "seconds": round(seconds),
+      "seconds_per_language": round(seconds_per_language),
+      "gemini_tokens": round(tokens),
+      "tts_characters": round(characters * languages),
+  }
+
+
+def _script_characters(script: Any) -> Optional[int]:
+  """Returns the number of characters of the utterances of a script.
+
+  Args:
+    script: The script of a line, a list of utterances with their "text".
+
+  Returns:
+    The number of characters, or None if the script is not a list of
+    utterances.
+  """
+  if not isinstance(script, list) or not all(
+      isinstance(utterance, dict) for utterance in script
+  ):
+    return None
+  return sum(len(str(utterance.get("text", ""))) for utterance in script)
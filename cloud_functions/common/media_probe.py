@@ -0,0 +1,195 @@
+"""Pre-flight check of the videos to dub, stored in Cloud Storage."""
+
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# -*- coding: utf-8 -*-
+
+import struct
+from typing import Any, Iterator, Optional
+from google.api_core import exceptions
+import state_store
+
+# Number of bytes read at a time while looking for the movie header of a
+# video. Most videos prepared for streaming start with it.
+HEADER_BYTES = 64 * 1024
+
+# Largest movie header read. Larger ones are not parsed, and the duration and
+# the audio of the video are left unknown.
+MAX_MOVIE_HEADER_BYTES = 16 * 1024 * 1024
+
+# Maximum number of top level boxes skipped while looking for the movie
+# header.
+MAX_TOP_LEVEL_BOXES = 32
+
+
+def probe(video_url: str) -> dict[str, Any]:
+  """Checks a video and reads its properties without downloading it.
+
+  The size and the MD5 hash come from the metadata of the object, the
+  duration and whether it has an audio stream from the movie header of the
+  MP4 or QuickTime container, found with ranged reads. They are None when
+  the container is not one of those.
+
+  Args:
+    video_url: The video_url of a line, the bucket and the path of the video.
+
+  Returns:
+    A dictionary with the "size" in bytes, the "md5_hash", the
+    "duration_seconds" and "has_audio" of the video.
+
+  Raises:
+    ValueError: If the video doesn't exist or is empty.
+  """
+  bucket_name, _, blob_name = video_url.partition("/")
+  try:
+    blob = (
+        state_store.get_storage_client()
+        .bucket(bucket_name)
+        .get_blob(blob_name)
+    )
+  except exceptions.NotFound:
+    blob = None
+  if blob is None:
+    raise ValueError(f"Video gs://{video_url} not found.")
+  if not blob.size:
+    raise ValueError(f"Video gs://{video_url} is empty.")
+
+  media = {
+      "size": blob.size,
+      "md5_hash": blob.md5_hash,
+      "duration_seconds": None,
+      "has_audio": None,
+  }
+  movie_header = _find_top_level_box(blob, b"moov")
+  if movie_header is not None:
+    media.update(_parse_movie_header(movie_header))
+  return media
+
+
+def _find_top_level_box(blob: Any, box_type: bytes) -> Optional[bytes]:
+  """Reads the content of a top level box of an MP4 or QuickTime file.
+
+  Only the headers of the boxes before it are read, with a ranged read for
+  each box not in the first HEADER_BYTES of the file.
+
+  Args:
+    blob: The google.cloud.storage.Blob of the file, with its size.
+    box_type: The four character type of the box.
+
+  Returns:
+    The content of the box, or None if the file is not an MP4 or QuickTime
+    file, or the box is not found or is too large.
+  """
+  buffer_start, buffer = 0, _read(blob, 0, HEADER_BYTES)
+  offset = 0
+  for _ in range(MAX_TOP_LEVEL_BOXES):
+    if offset + 8 > blob.size:
+      return None
+    if offset + 16 > buffer_start + len(buffer):
+      buffer_start, buffer = offset, _read(blob, offset, HEADER_BYTES)
+
+    header = _parse_box_header(
+        buffer, offset - buffer_start, blob.size - offset
+    )
+    if header is None:
+      return None
+    kind, size, header_size = header
+
+    if kind == box_type:
+      if size > MAX_MOVIE_HEADER_BYTES:
+        return None
+      if offset + size > buffer_start + len(buffer):
+        buffer_start, buffer = offset, _read(blob, offset, size)
+      start = offset - buffer_start
+      return buffer[start + header_size : start + size]
+    offset += size
+
+  return None
+
+
+def _parse_movie_header(movie_header: bytes) -> dict[str, Any]:
+  """Reads the duration and the audio of a video from its movie header.
+
+  Args:
+    movie_header: The content of the moov box.
+
+  Returns:
+    A dictionary with the "duration_seconds", if found, and "has_audio".
+  """
+  media = {"has_audio": False}
+  for kind, content in _iter_boxes(movie_header):
+    if kind == b"mvhd" and content:
+      if content[0] == 1:
+        timescale, duration = struct.unpack_from(">IQ", content, 20)
+      else:
+        timescale, duration = struct.unpack_from(">II", content, 12)
+      if timescale:
+        media["duration_seconds"] = round(duration / timescale, 3)
+    elif kind == b"trak":
+      for media_kind, media_content in _iter_boxes(content):
+        if media_kind != b"mdia":
+          continue
+        for handler_kind, handler in _iter_boxes(media_content):
+          if handler_kind == b"hdlr" and handler[8:12] == b"soun":
+            media["has_audio"] = True
+  return media
+
+
+def _iter_boxes(data: bytes) -> Iterator[tuple[bytes, bytes]]:
+  """Yields the (type, content) of the boxes held by a container box."""
+  offset = 0
+  while offset + 8 <= len(data):
+    header = _parse_box_header(data, offset, len(data) - offset)
+    if header is None:
+      return
+    kind, size, header_size = header
+    yield kind, data[offset + header_size : offset + size]
+    offset += size
+
+
+def _parse_box_header(
+    data: bytes, offset: int, remaining: int
+) -> Optional[tuple[bytes, int, int]]:
+  """Parses the header of a box.
+
+  Args:
+    data: The bytes holding the box.
+    offset: The offset of the box in data.
+    remaining: The number of bytes from the box to the end of its container,
+      the size of the boxes extending to it.
+
+  Returns:
+    A tuple of the type of the box, its size and the size of its header, or
+    None if it's not a valid box.
+  """
+  try:
+    size, kind = struct.unpack_from(">I4s", data, offset)
+    header_size = 8
+    if size == 1:
+      (size,) = struct.unpack_from(">Q", data, offset + 8)
+      header_size = 16
+    elif size == 0:
+      size = remaining
+  except struct.error:
+    return None
+  if size < header_size or size > remaining:
+    return None
+  return kind, size, header_size
+
+
+def _read(blob: Any, start: int, length: int) -> bytes:
+  """Reads a range of bytes of a file, clipped to its end."""
+  end = min(start + length, blob.size) - 1
+  return blob.download_as_bytes(start=start, end=end)
@@ -0,0 +1,202 @@
+"""Typed schema of the lines of the dubbing config tab."""
+
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# -*- coding: utf-8 -*-
+
+import ast
+import dataclasses
+import json
+from typing import Any, Callable, List
+
+
+@dataclasses.dataclass(slots=True)
+class DubbingRow:
+  """The configuration of a line of the dubbing config tab, with typed values.
+
+  The splitter parses the cells of every line once, with parse, and sends the
+  typed values to the dubbers, which rebuild the row with from_dict.
+  """
+
+  row_num: int
+  campaign_name: str
+  custom_tag: str
+  original_language: str
+  target_language: List[str]
+  video_url: str
+  script: Any
+  target_gender: str
+  voice_provider: str
+  clone_original_voices: bool
+  preferred_voice_family: List[str]
+  voices: dict[str, Any]
+  output_naming_convention: str
+  output_bucket: str
+  status: str
+  output_file_path: str
+  number_of_speakers: int
+  diarization_instructions: str
+  translation_instructions: str
+  no_dubbing_phrases: List[str]
+  merge_utterances: bool
+  minimum_merge_threshold: float
+  adjust_speed: bool
+  vocals_volume_adjustment: float
+  background_volume_adjustment: float
+  gemini_model_name: str
+  gemini_temperature: float
+  gemini_top_p: float
+  gemini_top_k: int
+  gemini_maximum_output_tokens: int
+  clean_up: bool
+  with_verification: bool
+  tts_params: dict[str, Any]
+
+  def to_dict(self) -> dict[str, Any]:
+    """Returns the row as a JSON serializable dictionary."""
+    return dataclasses.asdict(self)
+
+  @classmethod
+  def from_dict(cls, values: dict[str, Any]) -> "DubbingRow":
+    """Rebuilds a row from the dictionary returned by to_dict."""
+    return cls(**values)
+
+
+def _string(value: str) -> str:
+  """Parses a text cell."""
+  return value
+
+
+def _boolean(value: str) -> bool:
+  """Parses a True or False cell, in any case."""
+  if value.strip().lower() not in ("true", "false"):
+    raise ValueError(f"{value!r} is not True or False")
+  return value.strip().lower() == "true"
+
+
+def _integer(value: str) -> int:
+  """Parses an integer cell."""
+  return int(value)
+
+
+def _float(value: str) -> float:
+  """Parses a number cell."""
+  return float(value)
+
+
+def _string_list(value: str) -> List[str]:
+  """Parses a cell holding a Python list of strings."""
+  items = ast.literal_eval(value)
+  if not isinstance(items, (list, tuple)) or not all(
+      isinstance(item, str) for item in items
+  ):
+    raise ValueError(f"{value!r} is not a list of strings")
+  return list(items)
+
+
+def _script(value: str) -> Any:
+  """Parses the script cell, a Python list or dictionary of utterances."""
+  script = ast.literal_eval(value) if value.strip() else []
+  if not isinstance(script, (list, dict)):
+    raise ValueError(f"{value!r} is not a list or a dictionary")
+  return script
+
+
+def _json_object(value: str) -> dict[str, Any]:
+  """Parses a cell holding a JSON object."""
+  items = json.loads(value)
+  # An empty list is the default of the cells holding a dictionary.
+  if items == []:
+    return {}
+  if not isinstance(items, dict):
+    raise ValueError(f"{value!r} is not a JSON object")
+  return items
+
+
+# Parser of every cell of a line, in the order of the columns.
+FIELD_PARSERS: dict[str, Callable[[str], Any]] = {
+    "campaign_name": _string,
+    "custom_tag": _string,
+    "original_language": _string,
+    "target_language": _string_list,
+    "video_url": _string,
+    "script": _script,
+    "target_gender": _string,
+    "voice_provider": _string,
+    "clone_original_voices": _boolean,
+    "preferred_voice_family": _string_list,
+    "voices": _json_object,
+    "output_naming_convention": _string,
+    "output_bucket": _string,
+    "status": _string,
+    "output_file_path": _string,
+    "number_of_speakers": _integer,
+    "diarization_instructions": _string,
+    "translation_instructions": _string,
+    "no_dubbing_phrases": _string_list,
+    "merge_utterances": _boolean,
+    "minimum_merge_threshold": _float,
+    "adjust_speed": _boolean,
+    "vocals_volume_adjustment": _float,
+    "background_volume_adjustment": _float,
+    "gemini_model_name": _string,
+    "gemini_temperature": _float,
+    "gemini_top_p": _float,
+    "gemini_top_k": _integer,
+    "gemini_maximum_output_tokens": _integer,
+    "clean_up": _boolean,
+    "with_verification": _boolean,
+    "tts_params": _json_object,
+}
+
+
+def parse(line_config: dict[str, str], row_num: int) -> DubbingRow:
+  """Parses and validates the cells of a line.
+
+  Args:
+    line_config: The value of every cell of the line, with the defaults
+      applied, keyed by the names of FIELD_PARSERS.
+    row_num: The line number of the line.
+
+  Returns:
+    The DubbingRow of the line.
+
+  Raises:
+    ValueError: If any of the cells is not valid, with the errors of all of
+      them.
+  """
+  values = {"row_num": row_num}
+  errors = []
+  for key, parser in FIELD_PARSERS.items():
+    try:
+      values[key] = parser(line_config[key])
+    except (ValueError, SyntaxError, TypeError) as e:
+      errors.append(f"invalid {key}: {e}")
+
+  if not errors:
+    if not values["target_language"]:
+      errors.append("invalid target_language: no language")
+    if not values["video_url"]:
+      errors.append("invalid video_url: empty")
+    if values["script"]:
+      errors.extend(
+          f"invalid voices: no voice for {language}"
+          for language in values["target_language"]
+          if language not in values["voices"]
+      )
+
+  if errors:
+    raise ValueError("; ".join(errors))
+  return DubbingRow(**values)
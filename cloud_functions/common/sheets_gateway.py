@@ -0,0 +1,393 @@
+"""Google Sheets access shared by the Ariel Cloud Functions."""
+
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# -*- coding: utf-8 -*-
+
+from datetime import datetime
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, List, Optional
+import google.auth
+import gspread
+import requests
+
+READ = "read"
+WRITE = "write"
+
+# Default per-minute budgets of every instance, sized after the Sheets API
+# per-user quotas of 60 read and 60 write requests per minute. They can be
+# overridden with the SHEETS_READS_PER_MINUTE and SHEETS_WRITES_PER_MINUTE
+# environment variables.
+DEFAULT_REQUESTS_PER_MINUTE = {READ: 60, WRITE: 60}
+
+# Number of requests that can be sent in a burst before being paced.
+BURST_SIZE = 10
+
+# HTTP status codes of the errors worth retrying.
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+MAX_RETRIES = 6
+INITIAL_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 64.0
+
+# Maximum number of row ranges sent in a single values batch update call.
+STATUS_UPDATE_BATCH_SIZE = 500
+
+UPDATED_AT_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+class TokenBucket:
+  """Thread-safe token bucket rate limiter."""
+
+  def __init__(self, rate_per_second: float, capacity: int):
+    """Initializes a full bucket.
+
+    Args:
+      rate_per_second: Number of tokens added to the bucket every second.
+      capacity: Maximum number of tokens in the bucket.
+    """
+    self.rate_per_second = rate_per_second
+    self.capacity = capacity
+    self._tokens = float(capacity)
+    self._updated_at = time.monotonic()
+    self._lock = threading.Lock()
+
+  def acquire(self) -> float:
+    """Takes a token, waiting for one to be available.
+
+    Returns:
+      The number of seconds spent waiting.
+    """
+    with self._lock:
+      now = time.monotonic()
+      self._tokens = min(
+          self.capacity,
+          self._tokens + (now - self._updated_at) * self.rate_per_second,
+      )
+      self._updated_at = now
+      self._tokens -= 1
+      wait = -self._tokens / self.rate_per_second if self._tokens < 0 else 0.0
+
+    if wait:
+      time.sleep(wait)
+    return wait
+
+
+class SheetsGateway:
+  """Process-wide access point to the Google Sheets API.
+
+  Every request goes through a token bucket per kind of request (READ or
+  WRITE), and the requests failing with a quota or server error are retried
+  with jittered exponential backoff. The gateway keeps counters of the
+  requests, the retries, the time spent throttled and the time spent waiting
+  for the responses.
+  """
+
+  def __init__(
+      self,
+      client: gspread.Client,
+      requests_per_minute: Optional[dict[str, float]] = None,
+  ):
+    """Initializes the gateway.
+
+    Args:
+      client: An authenticated gspread client object.
+      requests_per_minute: The per-minute budget of each kind of request.
+    """
+    self.client = client
+    self._buckets = {
+        kind: TokenBucket(rate / 60, BURST_SIZE)
+        for kind, rate in (
+            requests_per_minute or DEFAULT_REQUESTS_PER_MINUTE
+        ).items()
+    }
+    self._lock = threading.Lock()
+    self.calls = 0
+    self.calls_per_kind = {kind: 0 for kind in self._buckets}
+    self.retries = 0
+    self.throttled_seconds = 0.0
+    self.request_seconds = 0.0
+
+  def call(self, kind: str, function: Callable[..., Any], *args, **kwargs):
+    """Calls a function sending a Sheets API request.
+
+    Args:
+      kind: The kind of request, READ or WRITE.
+      function: The function sending the request.
+      *args: The positional arguments of the function.
+      **kwargs: The keyword arguments of the function.
+
+    Returns:
+      The value returned by the function.
+    """
+    attempt = 0
+    while True:
+      waited = self._buckets[kind].acquire()
+      with self._lock:
+        self.calls += 1
+        self.calls_per_kind[kind] += 1
+        self.throttled_seconds += waited
+      started_at = time.monotonic()
+      try:
+        try:
+          return function(*args, **kwargs)
+        finally:
+          with self._lock:
+            self.request_seconds += time.monotonic() - started_at
+      except Exception as e:
+        if attempt >= MAX_RETRIES or not _is_retryable(e):
+          raise
+        delay = random.uniform(
+            0, min(MAX_BACKOFF_SECONDS, INITIAL_BACKOFF_SECONDS * 2**attempt)
+        )
+        with self._lock:
+          self.retries += 1
+          self.throttled_seconds += delay
+        time.sleep(delay)
+        attempt += 1
+
+  def stats(self) -> dict[str, Any]:
+    """Returns the counters of the gateway."""
+    with self._lock:
+      return {
+          "calls": self.calls,
+          "calls_per_kind": dict(self.calls_per_kind),
+          "retries": self.retries,
+          "throttled_seconds": round(self.throttled_seconds, 3),
+          "request_seconds": round(self.request_seconds, 3),
+      }
+
+
+class WorksheetCache:
+  """Per-request cache of spreadsheet and worksheet handles.
+
+  Opening a spreadsheet by URL and looking up one of its tabs by name each
+  fetch the spreadsheet metadata. The cache resolves every URL and every
+  (URL, tab name) pair only once, so later reads and writes cost a single API
+  round trip. All the requests are sent through a SheetsGateway.
+  """
+
+  def __init__(self, gateway: SheetsGateway):
+    """Initializes the cache.
+
+    Args:
+      gateway: The gateway sending the requests.
+    """
+    self.gateway = gateway
+    self._spreadsheets: dict[str, gspread.Spreadsheet] = {}
+    self._worksheets: dict[tuple[str, str], gspread.Worksheet] = {}
+
+  def spreadsheet(self, url: str) -> gspread.Spreadsheet:
+    """Returns the spreadsheet for a URL, opening it on first use.
+
+    Args:
+      url: The URL of the Google Sheet.
+
+    Returns:
+      The gspread.Spreadsheet object.
+    """
+    if url not in self._spreadsheets:
+      self._spreadsheets[url] = self.gateway.call(
+          READ, self.gateway.client.open_by_url, url
+      )
+    return self._spreadsheets[url]
+
+  def worksheet(self, url: str, worksheet_name: str) -> gspread.Worksheet:
+    """Returns a tab of a spreadsheet, looking it up on first use.
+
+    Args:
+      url: The URL of the Google Sheet.
+      worksheet_name: The name of the worksheet. The first worksheet is
+        returned when it's empty.
+
+    Returns:
+      The gspread.Worksheet object.
+    """
+    key = (url, worksheet_name)
+    if key not in self._worksheets:
+      spreadsheet = self.spreadsheet(url)
+      self._worksheets[key] = (
+          self.gateway.call(READ, spreadsheet.worksheet, worksheet_name)
+          if worksheet_name
+          else self.gateway.call(READ, spreadsheet.get_worksheet, 0)
+      )
+    return self._worksheets[key]
+
+  def has_worksheet(self, url: str, worksheet_name: str) -> bool:
+    """Checks whether a tab of a spreadsheet was already looked up.
+
+    Args:
+      url: The URL of the Google Sheet.
+      worksheet_name: The name of the worksheet.
+
+    Returns:
+      True if the worksheet is cached, so using it costs no lookup.
+    """
+    return (url, worksheet_name) in self._worksheets
+
+  def values_batch_get(
+      self, url: str, ranges: List[str], params: Optional[dict[str, str]] = None
+  ) -> dict[str, Any]:
+    """Reads several ranges of a spreadsheet in a single request.
+
+    Args:
+      url: The URL of the Google Sheet.
+      ranges: The absolute A1 ranges to read.
+      params: The query parameters of the request.
+
+    Returns:
+      The values batch get response body.
+    """
+    spreadsheet = self.spreadsheet(url)
+    return self.gateway.call(
+        READ, spreadsheet.values_batch_get, ranges, params=params
+    )
+
+  def update_values(
+      self,
+      url: str,
+      worksheet_name: str,
+      range_name: str,
+      values: List[List[Any]],
+  ) -> None:
+    """Writes the values of a range of a worksheet.
+
+    Args:
+      url: The URL of the Google Sheet.
+      worksheet_name: The name of the worksheet to update.
+      range_name: The A1 range to write, relative to the worksheet.
+      values: The values of every row of the range.
+    """
+    worksheet = self.worksheet(url, worksheet_name)
+    self.gateway.call(WRITE, worksheet.update, values, range_name=range_name)
+
+  def update_statuses(
+      self,
+      url: str,
+      worksheet_name: str,
+      status_columns: dict[str, str],
+      status_updates: List[tuple[Any, ...]],
+  ) -> None:
+    """Writes the processing status of several rows at once.
+
+    All the updates are sent in values batch update calls of at most
+    STATUS_UPDATE_BATCH_SIZE ranges each, instead of one call per row.
+    Updates can carry extra values, written to the columns following the
+    message column in the same call.
+
+    Args:
+      url: The URL of the Google Sheet.
+      worksheet_name: The name of the worksheet to update.
+      status_columns: A dictionary containing the column letters for
+        'STATUS_COLUMN', 'UPDATED_AT_COLUMN' and 'MESSAGE_COLUMN'.
+      status_updates: List of (row, status, updated_at, message) tuples, where
+        row is the sheet row number to update, status is the status to write
+        to the sheet (e.g., 'PROCESSING', 'FAILED'), updated_at is the time
+        the status was set and message is a message about the status,
+        optionally followed by a list of extra values.
+    """
+    if not status_updates:
+      return
+
+    message_column = gspread.utils.column_letter_to_index(
+        status_columns["MESSAGE_COLUMN"]
+    )
+    worksheet = self.worksheet(url, worksheet_name)
+    for start in range(0, len(status_updates), STATUS_UPDATE_BATCH_SIZE):
+      data = []
+      for row, status, updated_at, message, *extra in status_updates[
+          start : start + STATUS_UPDATE_BATCH_SIZE
+      ]:
+        extra_values = list(extra[0]) if extra else []
+        last_cell = gspread.utils.rowcol_to_a1(
+            row, message_column + len(extra_values)
+        )
+        data.append({
+            "range": f"{status_columns['STATUS_COLUMN']}{row}:{last_cell}",
+            "values": [[status, updated_at, message, *extra_values]],
+        })
+      self.gateway.call(WRITE, worksheet.batch_update, data)
+
+
+def get_gateway() -> SheetsGateway:
+  """Returns the gateway of the instance, creating it on first use.
+
+  The gspread client and its credentials are reused by every request served
+  by the instance.
+
+  Returns:
+    The SheetsGateway object.
+  """
+  global _gateway
+  with _gateway_lock:
+    if _gateway is None:
+      _gateway = SheetsGateway(
+          _init_google_sheet_client(),
+          {
+              READ: float(
+                  os.environ.get(
+                      "SHEETS_READS_PER_MINUTE",
+                      DEFAULT_REQUESTS_PER_MINUTE[READ],
+                  )
+              ),
+              WRITE: float(
+                  os.environ.get(
+                      "SHEETS_WRITES_PER_MINUTE",
+                      DEFAULT_REQUESTS_PER_MINUTE[WRITE],
+                  )
+              ),
+          },
+      )
+    return _gateway
+
+
+def now() -> str:
+  """Returns the current time formatted for the updated at column."""
+  return datetime.now().strftime(UPDATED_AT_FORMAT)
+
+
+def _is_retryable(error: Exception) -> bool:
+  """Checks whether a failed request is worth retrying."""
+  if isinstance(error, gspread.exceptions.APIError):
+    return error.code in RETRYABLE_STATUS_CODES
+  return isinstance(
+      error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+  )
+
+
+def _init_google_sheet_client() -> gspread.Client:
+  """Initializes and authenticates a gspread client.
+
+  This function sets up the necessary credentials and authorization
+  to interact with Google Sheets using the gspread library.
+
+  Returns:
+    A gspread.Client object authorized to access Google Sheets.
+  """
+  scopes = [
+      "https://www.googleapis.com/auth/spreadsheets",
+      "https://www.googleapis.com/auth/drive",
+      "https://spreadsheets.google.com/feeds",
+  ]
+
+  credentials, _ = google.auth.default(scopes=scopes)
+  client = gspread.authorize(credentials)
+
+  return client
@@ -0,0 +1,431 @@
+"""Storage of the state shared by the Ariel Cloud Functions."""
+
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# -*- coding: utf-8 -*-
+
+import abc
+import json
+import os
+import threading
+import time
+import urllib.parse
+from typing import Iterator, Optional
+from google.api_core import exceptions
+
+# Environment variable with the location of the state store, either a
+# gs://bucket/prefix URI or a local directory.
+STATE_STORE_URI_VARIABLE = "STATE_STORE_URI"
+
+_storage_client = None
+_storage_client_lock = threading.Lock()
+
+
+class StateStore(abc.ABC):
+  """Store of small objects with string metadata, addressed by key.
+
+  Keys are "/" separated paths relative to the root of the store.
+  """
+
+  @abc.abstractmethod
+  def read(self, key: str) -> Optional[bytes]:
+    """Returns the content of an object, or None if it doesn't exist."""
+
+  @abc.abstractmethod
+  def read_generation(self, key: str) -> tuple[Optional[bytes], int]:
+    """Returns the content of an object and its generation.
+
+    The generation changes every time the object is written, and is 0 when
+    the object doesn't exist, in which case the content is None.
+    """
+
+  @abc.abstractmethod
+  def write(
+      self, key: str, data: bytes, metadata: Optional[dict[str, str]] = None
+  ) -> None:
+    """Creates or replaces an object."""
+
+  @abc.abstractmethod
+  def create(
+      self, key: str, data: bytes, metadata: Optional[dict[str, str]] = None
+  ) -> bool:
+    """Creates an object atomically, unless it already exists.
+
+    Returns:
+      True if the object was created, False if it already existed.
+    """
+
+  @abc.abstractmethod
+  def replace(
+      self,
+      key: str,
+      data: bytes,
+      generation: int,
+      metadata: Optional[dict[str, str]] = None,
+  ) -> Optional[int]:
+    """Replaces an object atomically, unless it changed since it was read.
+
+    Args:
+      key: The key of the object.
+      data: The new content of the object.
+      generation: The generation of the object when it was read, as returned
+        by read_generation, 0 to create an object that doesn't exist.
+      metadata: The new metadata of the object.
+
+    Returns:
+      The new generation of the object, or None if its generation was not
+      generation anymore, in which case nothing is written.
+    """
+
+  @abc.abstractmethod
+  def delete(self, key: str, generation: Optional[int] = None) -> None:
+    """Deletes an object, if it exists.
+
+    Args:
+      key: The key of the object.
+      generation: Only delete the object if it still has this generation, as
+        returned by read_generation or replace.
+    """
+
+  @abc.abstractmethod
+  def list(self, prefix: str) -> Iterator[tuple[str, dict[str, str]]]:
+    """Yields the key and metadata of the objects starting with prefix."""
+
+  @abc.abstractmethod
+  def uri(self, key: str) -> str:
+    """Returns the URI of an object, as accepted by read_uri."""
+
+
+class GcsStateStore(StateStore):
+  """State store backed by a Google Cloud Storage bucket."""
+
+  def __init__(self, bucket_name: str, prefix: str = ""):
+    """Initializes the store.
+
+    Args:
+      bucket_name: Name of the GCS bucket.
+      prefix: Path inside the bucket used as the root of the store.
+    """
+    self.client = get_storage_client()
+    self.bucket = self.client.bucket(bucket_name)
+    self.prefix = f"{prefix.strip('/')}/" if prefix.strip("/") else ""
+
+  def read(self, key: str) -> Optional[bytes]:
+    blob = self.bucket.get_blob(self.prefix + key)
+    return blob.download_as_bytes() if blob else None
+
+  def read_generation(self, key: str) -> tuple[Optional[bytes], int]:
+    while True:
+      blob = self.bucket.get_blob(self.prefix + key)
+      if blob is None:
+        return None, 0
+      try:
+        return (
+            blob.download_as_bytes(if_generation_match=blob.generation),
+            blob.generation,
+        )
+      except (exceptions.PreconditionFailed, exceptions.NotFound):
+        # The object was written or deleted in the meantime.
+        continue
+
+  def write(
+      self, key: str, data: bytes, metadata: Optional[dict[str, str]] = None
+  ) -> None:
+    blob = self.bucket.blob(self.prefix + key)
+    blob.metadata = metadata
+    blob.upload_from_string(data)
+
+  def create(
+      self, key: str, data: bytes, metadata: Optional[dict[str, str]] = None
+  ) -> bool:
+    blob = self.bucket.blob(self.prefix + key)
+    blob.metadata = metadata
+    try:
+      blob.upload_from_string(data, if_generation_match=0)
+    except exceptions.PreconditionFailed:
+      return False
+    return True
+
+  def replace(
+      self,
+      key: str,
+      data: bytes,
+      generation: int,
+      metadata: Optional[dict[str, str]] = None,
+  ) -> Optional[int]:
+    blob = self.bucket.blob(self.prefix + key)
+    blob.metadata = metadata
+    try:
+      blob.upload_from_string(data, if_generation_match=generation)
+    except exceptions.PreconditionFailed:
+      return None
+    return blob.generation
+
+  def delete(self, key: str, generation: Optional[int] = None) -> None:
+    try:
+      self.bucket.blob(self.prefix + key).delete(
+          if_generation_match=generation
+      )
+    except (exceptions.NotFound, exceptions.PreconditionFailed):
+      pass
+
+  def list(self, prefix: str) -> Iterator[tuple[str, dict[str, str]]]:
+    blobs = self.client.list_blobs(self.bucket, prefix=self.prefix + prefix)
+    for blob in blobs:
+      yield blob.name[len(self.prefix) :], blob.metadata or {}
+
+  def uri(self, key: str) -> str:
+    return f"gs://{self.bucket.name}/{self.prefix}{key}"
+
+
+class LocalStateStore(StateStore):
+  """State store backed by a local directory, used when running locally.
+
+  The metadata of every object is kept in a sibling file with the
+  METADATA_SUFFIX suffix. The generation of an object is the modification
+  time of its file in nanoseconds, increased on every write, and the objects
+  are written under a lock so the conditional operations are atomic within
+  the process.
+  """
+
+  METADATA_SUFFIX = ".metadata.json"
+
+  _lock = threading.Lock()
+
+  def __init__(self, directory: str):
+    """Initializes the store.
+
+    Args:
+      directory: Path of the directory used as the root of the store.
+    """
+    self.directory = directory
+
+  def _path(self, key: str) -> str:
+    return os.path.join(self.directory, *key.split("/"))
+
+  def read(self, key: str) -> Optional[bytes]:
+    try:
+      with open(self._path(key), "rb") as f:
+        return f.read()
+    except FileNotFoundError:
+      return None
+
+  def read_generation(self, key: str) -> tuple[Optional[bytes], int]:
+    with self._lock:
+      return self.read(key), self._generation(key)
+
+  def write(
+      self, key: str, data: bytes, metadata: Optional[dict[str, str]] = None
+  ) -> None:
+    with self._lock:
+      self._write(key, data, metadata)
+
+  def create(
+      self, key: str, data: bytes, metadata: Optional[dict[str, str]] = None
+  ) -> bool:
+    return self.replace(key, data, 0, metadata) is not None
+
+  def replace(
+      self,
+      key: str,
+      data: bytes,
+      generation: int,
+      metadata: Optional[dict[str, str]] = None,
+  ) -> Optional[int]:
+    with self._lock:
+      if self._generation(key) != generation:
+        return None
+      try:
+        return self._write(key, data, metadata, exclusive=generation == 0)
+      except FileExistsError:
+        # Created by another process in the meantime.
+        return None
+
+  def delete(self, key: str, generation: Optional[int] = None) -> None:
+    with self._lock:
+      if generation is not None and self._generation(key) != generation:
+        return
+      for path in (self._path(key), self._path(key) + self.METADATA_SUFFIX):
+        try:
+          os.remove(path)
+        except FileNotFoundError:
+          pass
+
+  def _generation(self, key: str) -> int:
+    """Returns the generation of an object, 0 if it doesn't exist."""
+    try:
+      return os.stat(self._path(key)).st_mtime_ns
+    except FileNotFoundError:
+      return 0
+
+  def _write(
+      self,
+      key: str,
+      data: bytes,
+      metadata: Optional[dict[str, str]],
+      exclusive: bool = False,
+  ) -> int:
+    """Writes an object with a new generation, and returns it.
+
+    Args:
+      key: The key of the object.
+      data: The content of the object.
+      metadata: The metadata of the object.
+      exclusive: Whether to fail if the file exists, atomically.
+
+    Returns:
+      The generation of the object.
+
+    Raises:
+      FileExistsError: If exclusive is set and the object exists.
+    """
+    path = self._path(key)
+    generation = max(self._generation(key) + 1, time.time_ns())
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "xb" if exclusive else "wb") as f:
+      f.write(data)
+    with open(path + self.METADATA_SUFFIX, "w") as f:
+      json.dump(metadata or {}, f)
+    os.utime(path, ns=(generation, generation))
+    return generation
+
+  def list(self, prefix: str) -> Iterator[tuple[str, dict[str, str]]]:
+    for root, _, files in os.walk(self.directory):
+      for file_name in sorted(files):
+        if file_name.endswith(self.METADATA_SUFFIX):
+          continue
+        path = os.path.join(root, file_name)
+        key = os.path.relpath(path, self.directory).replace(os.sep, "/")
+        if not key.startswith(prefix):
+          continue
+        try:
+          with open(path + self.METADATA_SUFFIX) as f:
+            metadata = json.load(f)
+        except FileNotFoundError:
+          metadata = {}
+        yield key, metadata
+
+  def uri(self, key: str) -> str:
+    return self._path(key)
+
+
+def get_storage_client():
+  """Returns the Cloud Storage client of the instance, creating it on first use.
+
+  The google.cloud.storage module is only imported when a GCS backed store is
+  used, which keeps it out of the cold start of the local runs.
+
+  Returns:
+    The google.cloud.storage.Client object.
+  """
+  global _storage_client
+  with _storage_client_lock:
+    if _storage_client is None:
+      from google.cloud import storage  # pylint: disable=g-import-not-at-top
+
+      _storage_client = storage.Client()
+    return _storage_client
+
+
+def from_uri(uri: str) -> StateStore:
+  """Returns the state store for a gs://bucket/prefix URI or a directory."""
+  if uri.startswith("gs://"):
+    bucket_name, _, prefix = uri[len("gs://") :].partition("/")
+    return GcsStateStore(bucket_name, prefix)
+  return LocalStateStore(uri)
+
+
+def from_environment() -> Optional[StateStore]:
+  """Returns the state store set in the environment, if any."""
+  uri = os.environ.get(STATE_STORE_URI_VARIABLE)
+  return from_uri(uri) if uri else None
+
+
+def read_uri(uri: str) -> Optional[bytes]:
+  """Returns the content of the object at a URI returned by StateStore.uri.
+
+  Args:
+    uri: A gs://bucket/key URI or a local file path.
+
+  Returns:
+    The content of the object, or None if it doesn't exist.
+  """
+  directory, _, key = uri.rstrip("/").rpartition("/")
+  return from_uri(directory).read(key)
+
+
+def run_index_prefix(spreadsheet_id: str) -> str:
+  """Returns the prefix of the run index entries of a spreadsheet.
+
+  The run index has one object per successfully dubbed row content hash, with
+  the output of the run in its "output_file_path" metadata.
+
+  Args:
+    spreadsheet_id: The ID of the Google Sheet.
+
+  Returns:
+    The prefix of the keys of the run index entries.
+  """
+  return f"run_index/{spreadsheet_id}/"
+
+
+def group_prefix(group_id: str) -> str:
+  """Returns the prefix of the results of a group of messages.
+
+  A line dubbed into several languages can be published as one message per
+  language, all with the same group ID. Every message of the group has an
+  object named after its language, with the "status" and "message" of its
+  run in its metadata.
+
+  Args:
+    group_id: The ID of the group, set by the splitter.
+
+  Returns:
+    The prefix of the keys of the results of the group.
+  """
+  return f"groups/{group_id}/"
+
+
+def job_key(job_id: str) -> str:
+  """Returns the key of the claim of a job.
+
+  The dubber handling a message creates the claim of its job before dubbing
+  it, with the "status" of the job and the time it was "claimed_at" as JSON,
+  so the redeliveries of the message are recognized as duplicates.
+
+  Args:
+    job_id: The ID of the job, set by the splitter.
+
+  Returns:
+    The key of the claim of the job.
+  """
+  return f"jobs/{job_id}"
+
+
+def lock_key(spreadsheet_id: str, worksheet_name: str) -> str:
+  """Returns the key of the submission lock of a worksheet.
+
+  The splitter holds the lock of the dubbing config tab while it publishes
+  its lines, with the "batch_id" of the run and the time it "expires_at" as
+  JSON, so concurrent runs don't publish the same lines twice.
+
+  Args:
+    spreadsheet_id: The ID of the Google Sheet.
+    worksheet_name: The name of the dubbing config tab.
+
+  Returns:
+    The key of the submission lock.
+  """
+  return f"locks/{spreadsheet_id}/{urllib.parse.quote(worksheet_name, safe='')}"
@@ -0,0 +1,155 @@
+"""Status events sent by the dubbers to the status aggregator."""
+
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import threading
+from typing import Any, List, Optional
+from google.cloud import pubsub_v1
+import sheets_gateway
+
+# Environment variable with the name of the topic the status events are
+# published to. Without it, the statuses are written directly to the sheet.
+STATUS_TOPIC_VARIABLE = "STATUS_TOPIC"
+
+_publisher_client = None
+_publisher_client_lock = threading.Lock()
+
+
+def build_event(
+    worksheet_url: str,
+    worksheet_name: str,
+    status_columns: dict[str, str],
+    row: int,
+    status: str,
+    message: str,
+    output_file_paths: Optional[List[str]] = None,
+    timings: Optional[dict[str, float]] = None,
+) -> dict[str, Any]:
+  """Builds the status event of a row.
+
+  Args:
+    worksheet_url: The URL of the Google Sheet.
+    worksheet_name: The name of the worksheet holding the row.
+    status_columns: A dictionary containing the column letters for
+      'STATUS_COLUMN', 'UPDATED_AT_COLUMN' and 'MESSAGE_COLUMN'.
+    row: The sheet row number.
+    status: The status to write to the sheet (e.g., 'OK', 'FAILED').
+    message: The message to write to the sheet.
+    output_file_paths: The GCS paths of the dubbed files.
+    timings: Durations in seconds of the processing steps, for reporting.
+
+  Returns:
+    A dictionary with the status event.
+  """
+  return {
+      "worksheet_url": worksheet_url,
+      "worksheet_name": worksheet_name,
+      "status_columns": status_columns,
+      "row": row,
+      "status": status,
+      "message": message,
+      "updated_at": sheets_gateway.now(),
+      "output_file_paths": output_file_paths or [],
+      "timings": timings or {},
+  }
+
+
+def report(
+    project_id: str,
+    events: List[dict[str, Any]],
+    sheets_cache: Optional[sheets_gateway.WorksheetCache] = None,
+) -> None:
+  """Reports the status events of a request.
+
+  The events are published to the status topic when STATUS_TOPIC is set, and
+  written directly to the sheet in batched calls otherwise.
+
+  Args:
+    project_id: Google Cloud project ID.
+    events: The status events of the same worksheet, as returned by
+      build_event.
+    sheets_cache: Cache of the spreadsheet and worksheet handles of the
+      request, used to write the events directly to the sheet. A new one is
+      created when it's not set.
+  """
+  topic = os.environ.get(STATUS_TOPIC_VARIABLE)
+  if not topic:
+    write(
+        events,
+        sheets_cache
+        or sheets_gateway.WorksheetCache(sheets_gateway.get_gateway()),
+    )
+    return
+
+  publisher_client = _get_publisher_client()
+  topic_path = publisher_client.topic_path(project_id, topic)
+  futures = [
+      publisher_client.publish(
+          topic_path, data=bytes(json.dumps(event), "utf-8")
+      )
+      for event in events
+  ]
+  for future in futures:
+    future.result()
+
+
+def _get_publisher_client() -> pubsub_v1.PublisherClient:
+  """Returns the Pub/Sub client of the instance, creating it on first use.
+
+  Returns:
+    The PublisherClient object.
+  """
+  global _publisher_client
+  with _publisher_client_lock:
+    if _publisher_client is None:
+      _publisher_client = pubsub_v1.PublisherClient()
+    return _publisher_client
+
+
+def write(
+    events: List[dict[str, Any]], sheets_cache: sheets_gateway.WorksheetCache
+) -> None:
+  """Writes status events of the same worksheet in batched calls.
+
+  Only the latest event of every row, by updated_at, is written.
+
+  Args:
+    events: The status events, in the order they were reported.
+    sheets_cache: Cache of the spreadsheet and worksheet handles.
+  """
+  if not events:
+    return
+
+  latest = {}
+  for event in events:
+    if (
+        event["row"] not in latest
+        or event["updated_at"] >= latest[event["row"]]["updated_at"]
+    ):
+      latest[event["row"]] = event
+
+  sheets_cache.update_statuses(
+      events[0]["worksheet_url"],
+      events[0]["worksheet_name"],
+      events[-1]["status_columns"],
+      [
+          (row, event["status"], event["updated_at"], event["message"])
+          for row, event in sorted(latest.items())
+      ],
+  )
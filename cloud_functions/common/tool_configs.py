@@ -0,0 +1,240 @@
+"""Versioned tool configurations shared by the splitter and the dubbers."""
+
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import threading
+from google.api_core import exceptions
+import state_store
+
+# Prefix of the keys of the tool configurations in the state store.
+TOOL_CONFIGS_PREFIX = "tool_configs/"
+
+# Keys of the tool configuration holding API keys. They are kept in Secret
+# Manager rather than in the state store.
+SECRET_KEYS = (
+    "AI_STUDIO_API_KEY",
+    "HUGGING_FACE_ACCESS_TOKEN",
+    "ELEVEN_LABS_API_KEY",
+)
+
+# Key of the stored tool configuration holding the name of the secret version
+# with its API keys.
+SECRET_VERSION_KEY = "SECRET_VERSION"
+
+# Prefix of the IDs of the secrets holding the API keys, followed by a hash of
+# their values.
+SECRET_ID_PREFIX = "ariel-tool-config-"
+
+# Prefix of the keys of the API keys in a local state store. Local runs keep
+# them next to the tool configurations instead of in Secret Manager, so they
+# need no Google Cloud project and never write API keys to it.
+LOCAL_SECRETS_PREFIX = "secrets/"
+
+# Versions of the tool configuration loaded by the instance. They never
+# change, as they are derived from their content.
+_cache: dict[str, dict[str, str]] = {}
+_cache_lock = threading.Lock()
+
+_secret_client = None
+_secret_client_lock = threading.Lock()
+
+
+def publish(
+    store: state_store.StateStore, tool_config: dict[str, str], project_id: str
+) -> str:
+  """Writes a tool configuration to the state store.
+
+  The version of a tool configuration is derived from its content, so a new
+  version is only written when the tool config tab changes. Its API keys are
+  written to a secret of Secret Manager first, or to the store itself when
+  it's a local one, and the tool configuration only holds the name of the
+  secret version.
+
+  Args:
+    store: The state store to write the tool configuration to.
+    tool_config: The tool configuration, API keys included.
+    project_id: Google Cloud project ID, holding the secrets.
+
+  Returns:
+    The version of the tool configuration, to be sent to the dubbers.
+  """
+  stored_config = _stored_config(store, tool_config, project_id)
+  version_id = _version(stored_config)
+  key = f"{TOOL_CONFIGS_PREFIX}{version_id}.json"
+  if store.read(key) is not None:
+    return version_id
+
+  secrets = _secrets(tool_config)
+  if secrets and _is_local(store):
+    store.create(stored_config[SECRET_VERSION_KEY], _serialize(secrets))
+  elif secrets:
+    _publish_secrets(stored_config[SECRET_VERSION_KEY], secrets)
+  store.create(key, _serialize(stored_config))
+  return version_id
+
+
+def version(
+    store: state_store.StateStore, tool_config: dict[str, str], project_id: str
+) -> str:
+  """Returns the version of a tool configuration, without publishing it."""
+  return _version(_stored_config(store, tool_config, project_id))
+
+
+def _version(stored_config: dict[str, str]) -> str:
+  """Returns the version of a tool configuration, as stored."""
+  return hashlib.sha256(_serialize(stored_config)).hexdigest()
+
+
+def _serialize(tool_config: dict[str, str]) -> bytes:
+  """Serializes a tool configuration in a canonical way."""
+  return bytes(json.dumps(tool_config, sort_keys=True), "utf-8")
+
+
+def _secrets(tool_config: dict[str, str]) -> dict[str, str]:
+  """Returns the API keys of a tool configuration."""
+  return {key: tool_config[key] for key in SECRET_KEYS if key in tool_config}
+
+
+def _is_local(store: state_store.StateStore) -> bool:
+  """Checks whether the API keys are kept in the store itself."""
+  return isinstance(store, state_store.LocalStateStore)
+
+
+def _stored_config(
+    store: state_store.StateStore, tool_config: dict[str, str], project_id: str
+) -> dict[str, str]:
+  """Returns a tool configuration as written to the state store.
+
+  Args:
+    store: The state store the tool configuration is written to.
+    tool_config: The tool configuration, API keys included.
+    project_id: Google Cloud project ID, holding the secrets.
+
+  Returns:
+    The tool configuration without its API keys, and with the name of the
+    secret version holding them, if any, or their key in a local store. The
+    ID of the secret derives from the API keys, so every set of keys has its
+    own secret.
+  """
+  stored_config = {
+      key: value for key, value in tool_config.items() if key not in SECRET_KEYS
+  }
+  secrets = _secrets(tool_config)
+  if secrets:
+    secret_id = (
+        SECRET_ID_PREFIX + hashlib.sha256(_serialize(secrets)).hexdigest()
+    )
+    stored_config[SECRET_VERSION_KEY] = (
+        f"{LOCAL_SECRETS_PREFIX}{secret_id}.json"
+        if _is_local(store)
+        else f"projects/{project_id}/secrets/{secret_id}/versions/1"
+    )
+  return stored_config
+
+
+def _publish_secrets(secret_version: str, secrets: dict[str, str]) -> None:
+  """Creates the secret version holding the API keys, unless it exists.
+
+  Args:
+    secret_version: The name of the secret version, as set by _stored_config.
+    secrets: The API keys.
+  """
+  client = _get_secret_client()
+  secret = secret_version.rsplit("/versions/", 1)[0]
+  project, _, secret_id = secret.partition("/secrets/")
+  try:
+    client.create_secret(
+        request={
+            "parent": project,
+            "secret_id": secret_id,
+            "secret": {"replication": {"automatic": {}}},
+        }
+    )
+  except exceptions.AlreadyExists:
+    try:
+      client.get_secret_version(request={"name": secret_version})
+      return
+    except exceptions.NotFound:
+      # The instance creating the secret stopped before adding its version.
+      pass
+  client.add_secret_version(
+      request={"parent": secret, "payload": {"data": _serialize(secrets)}}
+  )
+
+
+def load(store: state_store.StateStore, version: str) -> dict[str, str]:
+  """Returns a version of the tool configuration.
+
+  Every version is read from the state store, and its API keys from Secret
+  Manager or the local store, once by an instance, and served from memory
+  afterwards.
+
+  Args:
+    store: The state store the tool configuration was published to.
+    version: The version of the tool configuration, as returned by publish.
+
+  Returns:
+    The tool configuration, API keys included.
+
+  Raises:
+    ValueError: If the version or the secret version of its API keys doesn't
+      exist.
+  """
+  with _cache_lock:
+    if version in _cache:
+      return _cache[version]
+
+  data = store.read(f"{TOOL_CONFIGS_PREFIX}{version}.json")
+  if data is None:
+    raise ValueError(f"Unknown tool config version {version}")
+  tool_config = json.loads(data)
+
+  secret_version = tool_config.pop(SECRET_VERSION_KEY, None)
+  if secret_version and secret_version.startswith(LOCAL_SECRETS_PREFIX):
+    secrets = store.read(secret_version)
+    if secrets is None:
+      raise ValueError(f"Unknown secret version {secret_version}")
+    tool_config.update(json.loads(secrets))
+  elif secret_version:
+    try:
+      response = _get_secret_client().access_secret_version(
+          request={"name": secret_version}
+      )
+    except exceptions.NotFound as e:
+      raise ValueError(f"Unknown secret version {secret_version}") from e
+    tool_config.update(json.loads(response.payload.data))
+
+  with _cache_lock:
+    _cache[version] = tool_config
+  return tool_config
+
+
+def _get_secret_client():
+  """Returns the Secret Manager client, creating it on first use.
+
+  Returns:
+    The secretmanager.SecretManagerServiceClient object.
+  """
+  global _secret_client
+  with _secret_client_lock:
+    if _secret_client is None:
+      from google.cloud import secretmanager  # pylint: disable=g-import-not-at-top
+
+      _secret_client = secretmanager.SecretManagerServiceClient()
+    return _secret_client
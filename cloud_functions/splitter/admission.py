@@ -0,0 +1 @@
+../common/admission.py
\ No newline at end of file
@@ -0,0 +1 @@
+../common/claim_check.py
\ No newline at end of file
@@ -0,0 +1 @@
+../common/dubbing_estimate.py
\ No newline at end of file
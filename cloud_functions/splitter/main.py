@@ -16,24 +16,53 @@
 #
 # -*- coding: utf-8 -*-
 
-from datetime import datetime
+import time
+
+# When the instance started loading the module, before its other imports.
+_MODULE_LOAD_STARTED_AT = time.monotonic()
+
+# pylint: disable=g-import-not-at-top
+import ast
+import concurrent.futures
+import dataclasses
+from datetime import datetime, timedelta
+import hashlib
+import itertools
 import json
+import math
 import os
 import sys
+import threading
 import traceback
-from typing import Any, List
+from typing import Any, Iterable, Iterator, List, Optional, TYPE_CHECKING
+import uuid
+import admission
+import claim_check
+import dubbing_estimate
 import flask
 import functions_framework
-import google.auth
-from google.cloud import logging
-from google.cloud import pubsub_v1
 import gspread
-import pandas as pd
-
-sheet_client = None
+import media_probe
+import row_schema
+import sheets_gateway
+import state_store
+import tool_configs
+# pylint: enable=g-import-not-at-top
+
+if TYPE_CHECKING:
+  # Imported on first use, as they are slow to load (see _get_logger,
+  # _get_publisher_client and _get_tasks_client).
+  from google.cloud import logging
+  from google.cloud import pubsub_v1
+  from google.cloud import tasks_v2
 
 STATUS_PROCESSING = "PROCESSING"
 STATUS_FAILED = "FAILED"
+STATUS_SUCCESS = "OK"
+# Status a user can set on a row to have it processed again.
+STATUS_RERUN = "RERUN"
+# Status of the rows left to the next run by the admission control.
+STATUS_DEFERRED = "DEFERRED"
 
 STATUS_COLUMNS = {
     "STATUS_COLUMN": "P",
@@ -41,7 +70,137 @@ STATUS_COLUMNS = {
     "MESSAGE_COLUMN": "R",
 }
 
+STATUS_COLUMN_INDEX = (
+    gspread.utils.column_letter_to_index(STATUS_COLUMNS["STATUS_COLUMN"]) - 1
+)
+UPDATED_AT_COLUMN_INDEX = (
+    gspread.utils.column_letter_to_index(STATUS_COLUMNS["UPDATED_AT_COLUMN"])
+    - 1
+)
+
+# Estimates of every published line written to the columns following the
+# status columns, in that order (see dubbing_estimate.estimate), followed by
+# the time the line is planned to start at.
+ESTIMATE_KEYS = ("seconds", "gemini_tokens", "tts_characters")
+
+# Headers of the columns following the status columns, S to V, written to the
+# header row by the runs that don't find them there. ESTIMATE_COLUMN_INDEX is
+# the position of the first one, starting at 0.
+ESTIMATE_HEADERS = (
+    "estimated_seconds",
+    "estimated_gemini_tokens",
+    "estimated_tts_characters",
+    "planned_start_at",
+)
+ESTIMATE_COLUMN_INDEX = gspread.utils.column_letter_to_index(
+    STATUS_COLUMNS["MESSAGE_COLUMN"]
+)
+
+# Statuses of the rows published when the request doesn't force a full run.
+INCREMENTAL_STATUSES = ("", STATUS_FAILED, STATUS_RERUN, STATUS_DEFERRED)
+
+# Rows still PROCESSING after this many seconds are considered abandoned and
+# published again.
+PROCESSING_TIMEOUT_SECONDS = 3600
+
+# Keys of a line's configuration left out of its content hash, as they hold
+# the results of processing it rather than its input.
+UNHASHED_KEYS = ("status", "output_file_path", "row_num")
+
+# Name of the dubbing config tab when the request doesn't set one. The actual
+# name is defined by the DUBBING_CONFIG variable of the tool config tab.
+DEFAULT_DUBBING_CONFIG_SHEET_NAME = "dubbing_config"
+
+# Columns read from the config tabs.
+SHEET_COLUMNS = "A:R"
+
+# Message of the error of the Sheets API when a range names a missing tab.
+UNKNOWN_RANGE_ERROR = "Unable to parse range"
+
+# Configuration parameters the rows to process can be filtered on.
+FILTER_KEYS = ("campaign_name", "custom_tag", "target_language")
+
+# Keys of a line's configuration that don't change how its video is
+# transcribed and dubbed in a language, only which languages are dubbed and
+# where the dubbed files go. With coalesce, the lines dubbed from the same
+# video that differ only in them are published as one job.
+COALESCED_KEYS = (
+    "row_num",
+    "custom_tag",
+    "target_language",
+    "target_gender",
+    "voices",
+    "output_naming_convention",
+    "output_bucket",
+    "status",
+    "output_file_path",
+    "clean_up",
+    "tts_params",
+)
+
+# Number of videos checked at a time by the pre-flight check of a window of
+# rows (see media_probe.probe).
+PREFLIGHT_MAX_WORKERS = 16
+
+# Lines are planned to start at most this many seconds after the start of the
+# run, well within the timeout of the splitter and SUBMISSION_LOCK_TTL_SECONDS.
+# The others get the DEFERRED status, and are published by a re-run of the
+# splitter scheduled this many seconds after the run (see _schedule_rerun).
+PACING_HORIZON_SECONDS = 300
+
+# Maximum number of re-runs scheduled in a row for the deferred lines, after
+# which they're left to the next run.
+MAX_RERUNS = 24
+
+# Maximum number of seconds Cloud Tasks waits for a re-run of the splitter,
+# the longest it allows.
+RERUN_DISPATCH_DEADLINE_SECONDS = 1800
+
+# Number of seconds the submission lock of a dubbing config tab is held for
+# without being refreshed. It is refreshed before reading every window of
+# rows, so it must cover the processing of a window, and released at the end
+# of the run.
+SUBMISSION_LOCK_TTL_SECONDS = 600
+
+# Reasons given by a dry run for the lines that wouldn't be published, by the
+# status they would get. The lines that would fail get their error.
+PLAN_SKIPPED_REASONS = {
+    STATUS_SUCCESS: "already dubbed",
+    STATUS_DEFERRED: "over the API quotas of the run, deferred to a later run",
+}
+
+# Number of rows of the dubbing config tab read, published and flushed at a
+# time.
+ROW_WINDOW_SIZE = 500
+
+# Batching of the messages published to the dubbers: a batch is sent once it
+# holds max_messages messages or max_bytes bytes, or max_latency seconds after
+# its first message, whichever comes first.
+PUBLISH_BATCH_SETTINGS = {
+    "max_messages": 500,
+    "max_bytes": 4 * 1024 * 1024,
+    "max_latency": 0.05,
+}
+
+# Flow control of the messages published to the dubbers: publishing blocks,
+# and so does the reading of the sheet, while more than message_limit messages
+# or byte_limit bytes are waiting to be published. They can be overridden with
+# the PUBLISH_MAX_OUTSTANDING_MESSAGES and PUBLISH_MAX_OUTSTANDING_BYTES
+# environment variables.
+PUBLISH_FLOW_CONTROL = {
+    "message_limit": 1000,
+    "byte_limit": 64 * 1024 * 1024,
+}
+
+# Maximum number of seconds to wait for a message to be published.
+PUBLISH_TIMEOUT_SECONDS = 60
+
+# Maximum number of seconds an instance should take to serve its first
+# request before processing it: loading the module and creating the clients.
+COLD_START_BUDGET_SECONDS = 2.0
+
 FAILED_STATUS_FOR_REPORTING = "ERROR_IN_ARIEL_SPLITTER"
+COLD_START_OVER_BUDGET_FOR_REPORTING = "ARIEL_SPLITTER_COLD_START_OVER_BUDGET"
 CF_NAME = "ariel_splitter"
 
 
@@ -84,35 +243,49 @@ DEFAULT_DUBBING_CONFIG: dict[str, str] = {
 }
 
 
-def _update_google_sheet(
-    url: str,
-    worksheet_name: str,
-    row: int,
-    status: str,
-    message: str,
-    client: gspread.Client,
-) -> gspread.Worksheet:
-  """Updates a Google Sheet with the processing status and a message.
-
-  Args:
-    url: The URL of the Google Sheet.
-    worksheet_name: The name of the worksheet to update.
-    row: The row number to update.
-    status: The status to write to the sheet (e.g., 'PROCESSING', 'FAILED').
-    message: A message about the status, typically an error message if the
-      status is 'FAILED'.
-    client: An authenticated gspread client object.
+@dataclasses.dataclass(slots=True)
+class RunOptions:
+  """The options of a run of the splitter, set by its request.
 
-  Returns:
-    The updated gspread.Worksheet object.
+  Attributes:
+    project_id: Google Cloud project ID.
+    pubsub_topic: Name of the PubSub topic to publish the messages to.
+    script_pubsub_topic: Name of the PubSub topic to publish the lines with a
+      script to, if they have their own topic.
+    batch_id: The ID of the run, which the job IDs of the lines derive from.
+    payload_store: The state store the large messages and the tool
+      configuration are written to, if any (see claim_check.check_in and
+      tool_configs.publish).
+    split_languages: Whether to publish one message per target language (see
+      _split_by_language).
+    preflight: Whether to check the videos of the lines before publishing
+      them (see media_probe.probe).
+    admission_controller: The controller pacing the publishing of the lines
+      within the quotas of the APIs, if any.
+    coalesce: Whether to publish the lines sharing a video as one message
+      (see _coalesce_rows).
   """
 
-  current_datetime = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-  sheet = client.open_by_url(url)
-  sheet.worksheet(worksheet_name).update(
-      f"{STATUS_COLUMNS['STATUS_COLUMN']}{row}:{STATUS_COLUMNS['MESSAGE_COLUMN']}{row}",
-      [[status, current_datetime, message]],
-  )
+  project_id: str
+  pubsub_topic: str
+  script_pubsub_topic: Optional[str] = None
+  batch_id: str = ""
+  payload_store: Optional[state_store.StateStore] = None
+  split_languages: bool = False
+  preflight: bool = False
+  admission_controller: Optional[admission.AdmissionController] = None
+  coalesce: bool = False
+
+
+# Clients of the instance, created on first use and reused by every request.
+_logger = None
+_publisher_client = None
+_tasks_client = None
+_clients_lock = threading.Lock()
+
+# Seconds of wall-clock time the instance spent loading the module, imports
+# included.
+_MODULE_LOAD_SECONDS = time.monotonic() - _MODULE_LOAD_STARTED_AT
 
 
 @functions_framework.http
@@ -129,9 +302,9 @@ def run(request: flask.Request) -> flask.Response:
       <https://flask.palletsprojects.com/en/1.1.x/api/#flask.make_response>.
   """
 
-  logging_client = logging.Client()
-  log_name = os.environ["DEPLOYMENT_NAME"] + CF_NAME
-  logger = logging_client.logger(log_name)
+  started_at = time.monotonic()
+  cold_start = _publisher_client is None
+  logger = _get_logger()
 
   required_elem = [
       "PROJECT_ID",
@@ -156,27 +329,172 @@ def run(request: flask.Request) -> flask.Response:
 
     worksheet_url = request_json["worksheet_url"]
     tool_config_sheet_name = request_json["tool_config_sheet_name"]
-    sheets_client = _init_google_sheet_client()
-    tool_config = _read_tool_config_from_google_sheet(
-        {}, sheets_client, worksheet_url, tool_config_sheet_name
+    dubbing_config_sheet_name = request_json.get(
+        "dubbing_config_sheet_name", DEFAULT_DUBBING_CONFIG_SHEET_NAME
     )
-
-    dubbing_config = _read_dubbing_config_from_google_sheet(
-        DEFAULT_DUBBING_CONFIG,
-        sheets_client,
+    auth_started_at = time.monotonic()
+    gateway = sheets_gateway.get_gateway()
+    publisher_client = _get_publisher_client()
+    auth_seconds = time.monotonic() - auth_started_at
+    if cold_start:
+      _report_cold_start(logger, time.monotonic() - started_at)
+    sheets_cache = sheets_gateway.WorksheetCache(gateway)
+    force = bool(request_json.get("force", False))
+    dry_run = bool(request_json.get("dry_run", False))
+    filters = _parse_filters(request_json)
+    store = state_store.from_environment()
+    batch_id = uuid.uuid4().hex
+    print(f"Batch {batch_id}")
+    split_languages = bool(request_json.get("split_languages", False))
+    if split_languages and not store:
+      print("Lines are not split per language without a state store.")
+      split_languages = False
+    options = RunOptions(
+        project_id=os.environ["PROJECT_ID"],
+        pubsub_topic=os.environ["PUBSUB_TOPIC"],
+        script_pubsub_topic=os.environ.get("SCRIPT_PUBSUB_TOPIC"),
+        batch_id=batch_id,
+        payload_store=store,
+        split_languages=split_languages,
+        preflight=bool(request_json.get("preflight", True)),
+        admission_controller=(
+            admission.AdmissionController(
+                admission.quotas_per_minute(),
+                PACING_HORIZON_SECONDS,
+                admission.backlog_messages(
+                    os.environ["PROJECT_ID"],
+                    [
+                        subscription
+                        for subscription in os.environ.get(
+                            "DUBBER_SUBSCRIPTIONS", ""
+                        ).split(",")
+                        if subscription
+                    ],
+                ),
+            )
+            if request_json.get("pacing", True)
+            else None
+        ),
+        coalesce=bool(request_json.get("coalesce", False)),
+    )
+    skipped = []
+    read_started_at = time.monotonic()
+    sheets_stats = gateway.stats()
+    tool_config, header, windows = _read_dubbing_rows_from_google_sheet(
         worksheet_url,
-        tool_config["DUBBING_CONFIG"],
+        tool_config_sheet_name,
+        dubbing_config_sheet_name,
+        _parse_row_selection(request_json),
+        filters,
+        sheets_cache,
+        # A dry run reads the rows as the run would, to count its reads.
+        read_first_window=not store,
+    )
+    dubbing_config = (
+        _read_dubbing_config_from_google_sheet(
+            DEFAULT_DUBBING_CONFIG,
+            header,
+            window,
+            force=force,
+            filters=filters,
+            skipped=skipped if dry_run else None,
+        )
+        for window in windows
     )
 
-    _process_lines(
-        os.environ["PROJECT_ID"],
-        os.environ["PUBSUB_TOPIC"],
-        tool_config,
-        dubbing_config,
-        sheets_client,
-        worksheet_url,
-        logger,
+    if dry_run:
+      run_index_started_at = time.monotonic()
+      run_index = _load_run_index(None if force else store, worksheet_url)
+      run_index_seconds = time.monotonic() - run_index_started_at
+      plan = _plan_lines(
+          tool_config,
+          dubbing_config,
+          worksheet_url,
+          run_index,
+          options,
+          skipped,
+      )
+      plan_stats = gateway.stats()
+      sheet_read_seconds = (
+          plan_stats["request_seconds"]
+          + plan_stats["throttled_seconds"]
+          - sheets_stats["request_seconds"]
+          - sheets_stats["throttled_seconds"]
+      )
+      serialize_seconds = plan.pop("serialize_seconds")
+      api_calls = plan["api_calls"]
+      api_calls["sheets_reads"] += (
+          plan_stats["calls_per_kind"][sheets_gateway.READ]
+          - sheets_stats["calls_per_kind"][sheets_gateway.READ]
+      )
+      headers_missing = _estimate_headers_missing(header)
+      # The real run looks up the dubbing config tab to write the estimate
+      # headers and the statuses, unless reading the rows looked it up.
+      if (
+          headers_missing or api_calls["sheets_writes"]
+      ) and not sheets_cache.has_worksheet(
+          worksheet_url, tool_config["DUBBING_CONFIG"]
+      ):
+        api_calls["sheets_reads"] += 1
+      api_calls["sheets_writes"] += int(headers_missing)
+      timings = {
+          "auth_seconds": auth_seconds,
+          "sheet_read_seconds": sheet_read_seconds,
+          "run_index_seconds": run_index_seconds,
+          "parse_seconds": (
+              time.monotonic()
+              - read_started_at
+              - sheet_read_seconds
+              - run_index_seconds
+              - serialize_seconds
+          ),
+          "serialize_seconds": serialize_seconds,
+      }
+      plan["timings"] = {
+          phase: round(seconds, 3) for phase, seconds in timings.items()
+      }
+      print(f"Plan of batch {batch_id}: {json.dumps(plan['api_calls'])}")
+      return {"batch_id": batch_id, "dry_run": True, **plan}, 200
+
+    lock = None
+    if store:
+      lock = SubmissionLock(
+          store,
+          state_store.lock_key(
+              gspread.utils.extract_id_from_url(worksheet_url),
+              tool_config["DUBBING_CONFIG"],
+          ),
+          batch_id,
+      )
+      running_batch_id = lock.acquire()
+      if running_batch_id is not None:
+        print(f"Batch {running_batch_id} already in progress.")
+        return {
+            "status": "batch already in progress",
+            "batch_id": running_batch_id,
+        }, 409
+      dubbing_config = lock.refreshed(dubbing_config)
+
+    _write_estimate_headers(
+        sheets_cache, worksheet_url, tool_config["DUBBING_CONFIG"], header
     )
+    try:
+      deferred_rows = _process_lines(
+          publisher_client,
+          tool_config,
+          dubbing_config,
+          sheets_cache,
+          worksheet_url,
+          logger,
+          _load_run_index(None if force else store, worksheet_url),
+          options,
+      )
+    finally:
+      if lock:
+        lock.release()
+    if deferred_rows:
+      _schedule_rerun(request_json, deferred_rows)
+    print(f"Sheets API usage of the instance: {json.dumps(gateway.stats())}")
 
     return "OK", 200
 
@@ -185,216 +503,1923 @@ def run(request: flask.Request) -> flask.Response:
     return f"Error {e}", 500
 
 
-def _process_lines(
-    project_id: str,
-    pubsub_topic: str,
-    tool_config: pd.DataFrame,
-    dubbing_config: List[dict[str, Any]],
-    sheets_client: gspread.Client,
-    worksheet_url: str,
-    logger: logging.Logger,
-) -> None:
-  """Processes each line in the dubbing configuration and publishes a message to PubSub.
+def _get_logger() -> "logging.Logger":
+  """Returns the logger of the instance, creating it on first use.
 
-  This function iterates through each row of the dubbing configuration,
-  prepares a payload containing the configuration for each video,
-  and publishes it to a PubSub topic for asynchronous processing.
-  It also updates the Google Sheet with the processing status.
+  Returns:
+    The google.cloud.logging.Logger object.
+  """
+  global _logger
+  with _clients_lock:
+    if _logger is None:
+      from google.cloud import logging  # pylint: disable=g-import-not-at-top
+
+      _logger = logging.Client().logger(
+          os.environ["DEPLOYMENT_NAME"] + CF_NAME
+      )
+    return _logger
+
+
+def _get_publisher_client() -> "pubsub_v1.PublisherClient":
+  """Returns the publisher client of the instance, creating it on first use.
+
+  The client, its credentials and its gRPC channel are reused by every request
+  served by the instance, and its credentials are refreshed as they expire.
+
+  Returns:
+    The Pub/Sub publisher client, with the PUBLISH_BATCH_SETTINGS batching and
+    the PUBLISH_FLOW_CONTROL flow control.
+  """
+  global _publisher_client
+  with _clients_lock:
+    if _publisher_client is None:
+      from google.cloud import pubsub_v1  # pylint: disable=g-import-not-at-top
+
+      _publisher_client = pubsub_v1.PublisherClient(
+          batch_settings=pubsub_v1.types.BatchSettings(
+              **PUBLISH_BATCH_SETTINGS
+          ),
+          publisher_options=pubsub_v1.types.PublisherOptions(
+              flow_control=pubsub_v1.types.PublishFlowControl(
+                  message_limit=int(
+                      os.environ.get(
+                          "PUBLISH_MAX_OUTSTANDING_MESSAGES",
+                          PUBLISH_FLOW_CONTROL["message_limit"],
+                      )
+                  ),
+                  byte_limit=int(
+                      os.environ.get(
+                          "PUBLISH_MAX_OUTSTANDING_BYTES",
+                          PUBLISH_FLOW_CONTROL["byte_limit"],
+                      )
+                  ),
+                  limit_exceeded_behavior=(
+                      pubsub_v1.types.LimitExceededBehavior.BLOCK
+                  ),
+              )
+          ),
+      )
+    return _publisher_client
+
+
+def _write_estimate_headers(
+    sheets_cache: sheets_gateway.WorksheetCache,
+    worksheet_url: str,
+    worksheet_name: str,
+    header: List[Any],
+):
+  """Writes the ESTIMATE_HEADERS to the header row, unless they're there.
 
   Args:
-    project_id: Google Cloud project ID.
-    pubsub_topic: Name of the PubSub topic to publish messages to.
-    tool_config: DataFrame containing tool-level configurations.
-    dubbing_config: List of dictionaries, each representing a line's dubbing
-      configuration.
-    sheets_client: gspread client object for interacting with Google Sheets.
+    sheets_cache: Cache of the spreadsheet and worksheet handles.
     worksheet_url: The URL of the Google Sheet containing the configuration.
-    logger: logging.Logger object for logging events and errors.
+    worksheet_name: The name of the dubbing config tab.
+    header: The header row of the dubbing config tab, estimate columns
+      included.
+  """
+  if not _estimate_headers_missing(header):
+    return
+  first_cell = gspread.utils.rowcol_to_a1(1, ESTIMATE_COLUMN_INDEX + 1)
+  last_cell = gspread.utils.rowcol_to_a1(
+      1, ESTIMATE_COLUMN_INDEX + len(ESTIMATE_HEADERS)
+  )
+  sheets_cache.update_values(
+      worksheet_url,
+      worksheet_name,
+      f"{first_cell}:{last_cell}",
+      [list(ESTIMATE_HEADERS)],
+  )
+
+
+def _estimate_headers_missing(header: List[Any]) -> bool:
+  """Checks whether the header row lacks any of the ESTIMATE_HEADERS.
+
+  Args:
+    header: The header row of the dubbing config tab, estimate columns
+      included.
+
   Returns:
-    None
+    True if _write_estimate_headers has to write them.
   """
+  headers = [
+      _cell(header, position)
+      for position in range(
+          ESTIMATE_COLUMN_INDEX, ESTIMATE_COLUMN_INDEX + len(ESTIMATE_HEADERS)
+      )
+  ]
+  return headers != list(ESTIMATE_HEADERS)
+
 
-  publisher_client = pubsub_v1.PublisherClient()
+def _get_tasks_client() -> "tasks_v2.CloudTasksClient":
+  """Returns the Cloud Tasks client of the instance, creating it on first use.
 
-  for row_num, line_config in enumerate(dubbing_config):
+  Returns:
+    The Cloud Tasks client.
+  """
+  global _tasks_client
+  with _clients_lock:
+    if _tasks_client is None:
+      from google.cloud import tasks_v2  # pylint: disable=g-import-not-at-top
 
-    line_config["row_num"] = row_num
-    message = ""
+      _tasks_client = tasks_v2.CloudTasksClient()
+    return _tasks_client
 
-    try:
 
-      status = STATUS_PROCESSING
-      payload = {
-          "worksheet_url": worksheet_url,
-          "line_config": line_config,
-          "tool_config": tool_config,
-          "status_columns": STATUS_COLUMNS,
-      }
+def _schedule_rerun(request_json: dict[str, Any], deferred_rows: List[int]):
+  """Schedules a re-run of the splitter publishing the deferred lines.
 
-      _publish_pubsub(publisher_client, project_id, pubsub_topic, payload)
+  The re-run is a Cloud Tasks task of the RERUN_QUEUE queue, sending the same
+  request for the deferred rows only, PACING_HORIZON_SECONDS later, once the
+  API usage reserved by the run is spent. Without a queue, or after MAX_RERUNS
+  re-runs in a row, the deferred lines are left to the next run.
 
-    except Exception as e:
-      traceback.print_exc()
-      print(str(e))
-      logger.log(str(e))
-      logging_payload = {
-          "worksheet_url": worksheet_url if worksheet_url else None,
-          "status": FAILED_STATUS_FOR_REPORTING,
-          "message": (
-              str(e)
-              if len(str(e)) > 1
-              else "Check you shared the spreadsheet with the service account"
-          ),
-          "success": False,
+  Args:
+    request_json: The body of the request of the run.
+    deferred_rows: The sheet row numbers of the deferred lines.
+  """
+  rerun = int(request_json.get("rerun", 0)) + 1
+  queue, url = os.environ.get("RERUN_QUEUE"), os.environ.get("SPLITTER_URL")
+  if not queue or not url or rerun > MAX_RERUNS:
+    print(f"{len(deferred_rows)} deferred lines left to the next run.")
+    return
+
+  body = {
+      **{
+          key: value
+          for key, value in request_json.items()
+          if key != "row_ranges"
+      },
+      "row_numbers": deferred_rows,
+      "force": False,
+      "dry_run": False,
+      "rerun": rerun,
+  }
+  try:
+    task = _get_tasks_client().create_task(
+        parent=queue,
+        task={
+            "http_request": {
+                "url": url,
+                "headers": {"Content-Type": "application/json"},
+                "body": bytes(json.dumps(body), "utf-8"),
+                "oidc_token": {
+                    "service_account_email": os.environ["SERVICE_ACCOUNT"],
+                    "audience": url,
+                },
+            },
+            "schedule_time": {
+                "seconds": int(time.time() + PACING_HORIZON_SECONDS)
+            },
+            "dispatch_deadline": {"seconds": RERUN_DISPATCH_DEADLINE_SECONDS},
+        },
+    )
+    print(f"{len(deferred_rows)} deferred lines re-run by {task.name}.")
+  except Exception:
+    traceback.print_exc()
+    print(f"{len(deferred_rows)} deferred lines left to the next run.")
+
+
+def _report_cold_start(logger: "logging.Logger", clients_seconds: float):
+  """Reports how long the instance took to be ready for its first request.
+
+  Args:
+    logger: logging.Logger object for logging events and errors.
+    clients_seconds: Number of seconds spent creating the clients.
+  """
+  cold_start = {
+      "module_load_seconds": round(_MODULE_LOAD_SECONDS, 3),
+      "clients_seconds": round(clients_seconds, 3),
+      "budget_seconds": COLD_START_BUDGET_SECONDS,
+  }
+  print(f"Cold start: {json.dumps(cold_start)}")
+  if _MODULE_LOAD_SECONDS + clients_seconds > COLD_START_BUDGET_SECONDS:
+    logger.log_text(
+        f"{COLD_START_OVER_BUDGET_FOR_REPORTING}: {json.dumps(cold_start)}"
+    )
+
+
+class SubmissionLock:
+  """Submission lock of a dubbing config tab, held by a run of the splitter.
+
+  The lock is a lease expiring SUBMISSION_LOCK_TTL_SECONDS after it was last
+  refreshed. Every write of the lock is conditional on the generation the run
+  holds, so a lock taken over by another run is never overwritten or deleted.
+  """
+
+  def __init__(self, store: state_store.StateStore, key: str, batch_id: str):
+    """Initializes a lock that isn't held yet.
+
+    Args:
+      store: The state store holding the locks.
+      key: The key of the lock, as returned by state_store.lock_key.
+      batch_id: The ID of the run taking the lock.
+    """
+    self.store = store
+    self.key = key
+    self.batch_id = batch_id
+    self.generation = None
+
+  def acquire(self) -> Optional[str]:
+    """Takes the lock.
+
+    The lock is created atomically, so only one of concurrent runs on the same
+    tab takes it. An expired lock was left by a run stopped before releasing
+    it, and is taken over by replacing it only if it's still the one read, so
+    a single run takes it over.
+
+    Returns:
+      None if the lock was taken, the ID of the batch holding it otherwise.
+    """
+    self.generation = self.store.replace(self.key, self._lease(), 0)
+    if self.generation is not None:
+      return None
+
+    data, generation = self.store.read_generation(self.key)
+    holder = json.loads(data or "{}")
+    if holder and holder.get("expires_at", 0) > time.time():
+      return holder.get("batch_id", "")
+
+    self.generation = self.store.replace(self.key, self._lease(), generation)
+    if self.generation is not None:
+      return None
+    return json.loads(self.store.read(self.key) or "{}").get("batch_id", "")
+
+  def refresh(self) -> None:
+    """Extends the lease of the lock.
+
+    Raises:
+      ValueError: The lock expired and was taken over by another run.
+    """
+    self.generation = self.store.replace(
+        self.key, self._lease(), self.generation
+    )
+    if self.generation is None:
+      raise ValueError(
+          f"Batch {self.batch_id} lost the lock {self.key} to another run."
+      )
+
+  def refreshed(self, windows: Iterator[Any]) -> Iterator[Any]:
+    """Refreshes the lock before reading every window of lines.
+
+    Args:
+      windows: The windows of lines of the run, read as they're iterated.
+
+    Yields:
+      The windows of lines.
+
+    Raises:
+      ValueError: The lock was taken over by another run, which publishes the
+        remaining lines.
+    """
+    while True:
+      self.refresh()
+      window = next(windows, None)
+      if window is None:
+        return
+      yield window
+
+  def release(self) -> None:
+    """Releases the lock, unless it was taken over by another run."""
+    if self.generation is not None:
+      self.store.delete(self.key, self.generation)
+      self.generation = None
+
+  def _lease(self) -> bytes:
+    """Returns the content of the lock, expiring after the TTL."""
+    return bytes(
+        json.dumps({
+            "batch_id": self.batch_id,
+            "expires_at": time.time() + SUBMISSION_LOCK_TTL_SECONDS,
+        }),
+        "utf-8",
+    )
+
+
+def _process_lines(
+    publisher_client: "pubsub_v1.PublisherClient",
+    tool_config: dict[str, str],
+    dubbing_config: Iterable[Iterable[tuple[int, str, tuple[str, ...]]]],
+    sheets_cache: sheets_gateway.WorksheetCache,
+    worksheet_url: str,
+    logger: "logging.Logger",
+    run_index: dict[str, dict[str, str]],
+    options: RunOptions,
+) -> List[int]:
+  """Publishes the lines of the dubbing configuration to PubSub.
+
+  Every window of lines is prepared by _prepare_lines, and the status of
+  every line is written back to the Google Sheet in batched calls, with its
+  estimates and planned start time, before the messages of its jobs are
+  published in batches without blocking (see _build_payloads and
+  _publish_pubsub). The lines whose messages fail to be published get the
+  FAILED status once the window is published. Publishing only blocks, and so
+  does the reading of the sheet, while the backlog of the client exceeds
+  PUBLISH_FLOW_CONTROL.
+
+  Args:
+    publisher_client: A Pub/Sub publisher client instance.
+    tool_config: Dictionary containing tool-level configurations.
+    dubbing_config: Iterable of windows of lines, each an iterable of
+      (line number, status, values) tuples representing a line's dubbing
+      configuration with one value per key of DEFAULT_DUBBING_CONFIG.
+    sheets_cache: Cache of the spreadsheet and worksheet handles of the request.
+    worksheet_url: The URL of the Google Sheet containing the configuration.
+    logger: logging.Logger object for logging events and errors.
+    run_index: Dictionary with the successful runs of the spreadsheet, as
+      returned by _load_run_index.
+    options: The options of the run.
+  Returns:
+    The sheet row numbers of the lines deferred to a later run.
+  """
+
+  topic_path = publisher_client.topic_path(
+      options.project_id, options.pubsub_topic
+  )
+  script_topic_path = (
+      publisher_client.topic_path(
+          options.project_id, options.script_pubsub_topic
+      )
+      if options.script_pubsub_topic
+      else topic_path
+  )
+  tool_config_reference = (
+      {
+          "tool_config_version": tool_configs.publish(
+              options.payload_store, tool_config, options.project_id
+          )
       }
-      logger.log_text(
-          f"{FAILED_STATUS_FOR_REPORTING}: {json.dumps(logging_payload)}"
+      if options.payload_store
+      else {"tool_config": tool_config}
+  )
+  probes = {}
+
+  deferred_rows = []
+  for lines in dubbing_config:
+
+    status_updates = []
+    publish_futures = []
+    try:
+
+      outcomes, jobs = _prepare_lines(lines, run_index, probes, options)
+      for row_num, status, message, extra_values in outcomes:
+        if status == STATUS_FAILED:
+          message = _log_failure(logger, worksheet_url, message)
+        elif status == STATUS_DEFERRED:
+          deferred_rows.append(row_num + 2)
+        status_updates.append(
+            (row_num + 2, status, sheets_gateway.now(), message, extra_values)
+        )
+      for group, estimate, start in jobs:
+        status_updates.extend(
+            (
+                member_row.row_num + 2,
+                STATUS_PROCESSING,
+                sheets_gateway.now(),
+                _estimate_message(estimate),
+                _extra_values(estimate, _planned_start_at(start)),
+            )
+            for member_row, _, _ in group
+        )
+
+      # The lines are marked as processing before waiting for their planned
+      # start, so the sheet shows when they'll start while the run is paced.
+      sheets_cache.update_statuses(
+          worksheet_url,
+          tool_config["DUBBING_CONFIG"],
+          STATUS_COLUMNS,
+          status_updates,
       )
-      status = STATUS_FAILED
-      message = logging_payload["message"]
+      status_updates = []
+
+      for group, estimate, start in jobs:
+
+        row, row_hash, media = group[0]
+        row_nums = [member_row.row_num for member_row, _, _ in group]
+        try:
+
+          time.sleep(max(0.0, start - time.monotonic()))
+          line_topic_path = (
+              script_topic_path if _is_script_line(row) else topic_path
+          )
+          futures = [
+              _publish_pubsub(
+                  publisher_client,
+                  line_topic_path,
+                  payload,
+                  options.payload_store,
+              )
+              for payload in _build_payloads(
+                  worksheet_url,
+                  row,
+                  row_hash,
+                  tool_config_reference,
+                  options.batch_id,
+                  options.split_languages,
+                  media,
+                  group[1:],
+              )
+          ]
+          publish_futures.extend((row_num, futures) for row_num in row_nums)
+
+        except Exception as e:
+          message = _log_failure(logger, worksheet_url, e)
+          status_updates.extend(
+              (row_num + 2, STATUS_FAILED, sheets_gateway.now(), message)
+              for row_num in row_nums
+          )
 
     finally:
 
-      _update_google_sheet(
+      status_updates.extend(
+          _wait_for_publishing(publish_futures, worksheet_url, logger)
+      )
+      sheets_cache.update_statuses(
           worksheet_url,
           tool_config["DUBBING_CONFIG"],
-          row_num + 2,
-          status,
-          message if status == STATUS_FAILED else "",
-          client=sheets_client,
+          STATUS_COLUMNS,
+          status_updates,
       )
 
+  return deferred_rows
+
+
+def _plan_lines(
+    tool_config: dict[str, str],
+    dubbing_config: Iterable[Iterable[tuple[int, str, tuple[str, ...]]]],
+    worksheet_url: str,
+    run_index: dict[str, dict[str, str]],
+    options: RunOptions,
+    skipped: Optional[List[tuple[int, str]]] = None,
+) -> dict[str, Any]:
+  """Plans the processing of the lines without publishing or writing anything.
+
+  The lines are prepared by _prepare_lines, as in _process_lines, including
+  the pre-flight check of their videos, and their messages are serialized,
+  but nothing is published to PubSub, written to the payload store or written
+  back to the Google Sheet. The lines are planned without waiting for the
+  admission controller.
+
+  Args:
+    tool_config: Dictionary containing tool-level configurations.
+    dubbing_config: Iterable of windows of lines, as in _process_lines.
+    worksheet_url: The URL of the Google Sheet containing the configuration.
+    run_index: Dictionary with the successful runs of the spreadsheet, as
+      returned by _load_run_index.
+    options: The options of the run.
+    skipped: List of the (line number, reason) tuples of the lines skipped
+      while reading the sheet, the lines already dubbed, the lines with
+      invalid cells and the lines failing the pre-flight check are appended
+      to it.
+
+  Returns:
+    A dictionary with the "rows" that would be published, with the topic, the
+    size of every message, the properties of the video with preflight, the
+    estimate of the dubbing and the seconds after which it would start, and
+    the rows coalesced with it, the
+    "skipped" rows with the reason, the number of "api_calls" of a real run,
+    but for the reads of the Google Sheet and the write of the estimate
+    headers, left to the caller, and the time spent serializing the messages,
+    in "serialize_seconds".
+  """
+  skipped = skipped if skipped is not None else []
+  tool_config_reference = (
+      {
+          "tool_config_version": tool_configs.version(
+              options.payload_store, tool_config, options.project_id
+          )
+      }
+      if options.payload_store
+      else {"tool_config": tool_config}
+  )
+  claim_check_threshold = claim_check.threshold_bytes()
+  rows = []
+  message_sizes = {}
+  sheets_writes = 0
+  serialize_seconds = 0.0
+  probes = {}
+  planned_at = time.monotonic()
+
+  for lines in dubbing_config:
+
+    outcomes, jobs = _prepare_lines(lines, run_index, probes, options)
+    skipped.extend(
+        (row_num, PLAN_SKIPPED_REASONS.get(status) or str(message))
+        for row_num, status, message, _ in outcomes
+    )
+
+    for group, estimate, start in jobs:
+
+      row, row_hash, media = group[0]
+      serialize_started_at = time.monotonic()
+      sizes = [
+          len(bytes(json.dumps(payload), "utf-8"))
+          for payload in _build_payloads(
+              worksheet_url,
+              row,
+              row_hash,
+              tool_config_reference,
+              options.batch_id,
+              options.split_languages,
+              media,
+              group[1:],
+          )
+      ]
+      serialize_seconds += time.monotonic() - serialize_started_at
+
+      topic = (
+          options.script_pubsub_topic
+          if options.script_pubsub_topic and _is_script_line(row)
+          else options.pubsub_topic
+      )
+      claim_checked = (
+          sum(size > claim_check_threshold for size in sizes)
+          if options.payload_store
+          else 0
+      )
+      message_sizes.setdefault(topic, []).extend(
+          min(size, claim_check_threshold) if options.payload_store else size
+          for size in sizes
+      )
+      rows.append({
+          "row": row.row_num + 2,
+          "topic": topic,
+          "payload_bytes": sizes,
+          "claim_checked": claim_checked,
+          **({"media": media} if media else {}),
+          **({"estimate": estimate} if estimate else {}),
+          "start_after_seconds": round(max(0.0, start - planned_at), 3),
+          **(
+              {
+                  "coalesced_rows": [
+                      member_row.row_num + 2 for member_row, _, _ in group[1:]
+                  ]
+              }
+              if len(group) > 1
+              else {}
+          ),
+      })
+
+    status_updates = len(outcomes) + sum(len(group) for group, _, _ in jobs)
+    sheets_writes += math.ceil(
+        status_updates / sheets_gateway.STATUS_UPDATE_BATCH_SIZE
+    )
+
+  return {
+      "rows": rows,
+      "skipped": [
+          {"row": row_num + 2, "reason": reason}
+          for row_num, reason in sorted(skipped)
+      ],
+      "api_calls": {
+          "sheets_writes": sheets_writes,
+          # Counted by the caller, from the reads of the Google Sheet.
+          "sheets_reads": 0,
+          "pubsub_publish": sum(
+              _count_publish_batches(sizes) for sizes in message_sizes.values()
+          ),
+          "state_store_writes": (
+              sum(row["claim_checked"] for row in rows) + 1
+              if options.payload_store
+              else 0
+          ),
+      },
+      "serialize_seconds": serialize_seconds,
+  }
+
+
+def _prepare_lines(
+    lines: Iterable[tuple[int, str, tuple[str, ...]]],
+    run_index: dict[str, dict[str, str]],
+    probes: dict[str, Any],
+    options: RunOptions,
+) -> tuple[
+    List[tuple[int, str, Any, List[Any]]],
+    List[tuple[List[tuple[row_schema.DubbingRow, str, Any]], Any, float]],
+]:
+  """Prepares the jobs of a window of lines, shared by real and dry runs.
+
+  The lines found in the run index were already dubbed, unless the user
+  flagged them with the RERUN status. The cells of the others are parsed with
+  row_schema.parse, their videos are checked with preflight, and they are
+  grouped with coalesce. The dubbing of every job is estimated, and its API
+  usage is reserved from the admission controller.
+
+  Args:
+    lines: The (line number, status, values) tuples of the window.
+    run_index: Dictionary with the successful runs of the spreadsheet, as
+      returned by _load_run_index.
+    probes: The properties of the videos already checked by the run, updated
+      with the videos of the window.
+    options: The options of the run.
+
+  Returns:
+    A tuple with the (line number, status, message, extra values) of every
+    line that isn't published, with the STATUS_SUCCESS status and the output
+    of its previous run, the STATUS_FAILED status and the exception raised for
+    it, or the STATUS_DEFERRED status, and the (group, estimate, start) of
+    every job to publish, where group is as returned by _coalesce_rows and
+    start is the time.monotonic() time the job is planned to start at, 0 to
+    start at once.
+  """
+  outcomes = []
+  rows = []
+  for row_num, row_status, line_values in lines:
+
+    line_config = dict(zip(DEFAULT_DUBBING_CONFIG, line_values))
+    row_hash = _hash_line_config(line_config)
+
+    try:
+
+      previous_run = (
+          run_index.get(row_hash) if row_status != STATUS_RERUN else None
+      )
+      if previous_run:
+        outcomes.append((
+            row_num,
+            STATUS_SUCCESS,
+            previous_run.get("output_file_path", ""),
+            [],
+        ))
+        continue
+
+      rows.append((row_schema.parse(line_config, row_num), row_hash))
+
+    except Exception as e:
+      outcomes.append((row_num, STATUS_FAILED, e, []))
+
+  if options.preflight:
+    _probe_videos([row for row, _ in rows], probes)
+
+  checked_rows = []
+  for row, row_hash in rows:
+    try:
+      checked_rows.append((
+          row,
+          row_hash,
+          _check_media(row, probes) if options.preflight else None,
+      ))
+    except Exception as e:
+      outcomes.append((row.row_num, STATUS_FAILED, e, []))
+
+  jobs = []
+  for group in _coalesce_rows(checked_rows, options.coalesce):
+
+    row_nums = [member_row.row_num for member_row, _, _ in group]
+    try:
+
+      job_row = _job_row(group)
+      estimate = _estimate_line(
+          job_row, group[0][2], options.split_languages, len(group) > 1
+      )
+      start = (
+          options.admission_controller.reserve(_api_usage(job_row, estimate))
+          if options.admission_controller
+          else 0.0
+      )
+
+    except Exception as e:
+      outcomes.extend((row_num, STATUS_FAILED, e, []) for row_num in row_nums)
+      continue
+
+    if start is None:
+      outcomes.extend(
+          (
+              row_num,
+              STATUS_DEFERRED,
+              "Over the API quotas of the run, deferred to a later run.",
+              _extra_values(estimate),
+          )
+          for row_num in row_nums
+      )
+      continue
+    jobs.append((group, estimate, start))
+
+  return outcomes, jobs
+
+
+def _count_publish_batches(message_sizes: List[int]) -> int:
+  """Returns the minimum number of publish calls sending some messages.
+
+  Args:
+    message_sizes: The size in bytes of the messages sent to a topic, in the
+      order they are published.
+
+  Returns:
+    The number of batches of the messages, as per PUBLISH_BATCH_SETTINGS.
+    Batches are also sent after max_latency seconds, so a real run can send
+    more.
+  """
+  batches = 0
+  batch_messages = batch_bytes = 0
+  for size in message_sizes:
+    if batches == 0 or (
+        batch_messages + 1 > PUBLISH_BATCH_SETTINGS["max_messages"]
+        or batch_bytes + size > PUBLISH_BATCH_SETTINGS["max_bytes"]
+    ):
+      batches += 1
+      batch_messages = batch_bytes = 0
+    batch_messages += 1
+    batch_bytes += size
+  return batches
+
+
+def _build_payloads(
+    worksheet_url: str,
+    row: row_schema.DubbingRow,
+    row_hash: str,
+    tool_config_reference: dict[str, Any],
+    batch_id: str,
+    split_languages: bool = False,
+    media: Optional[dict[str, Any]] = None,
+    coalesced_rows: Optional[
+        List[tuple[row_schema.DubbingRow, str, Any]]
+    ] = None,
+) -> List[dict[str, Any]]:
+  """Builds the payloads of the messages of a line.
+
+  The lines coalesced with the line are sent along with it, in the
+  "coalesced_lines" of a single message, which is never split per language.
+
+  Args:
+    worksheet_url: The URL of the Google Sheet containing the configuration.
+    row: The typed configuration of the line.
+    row_hash: The content hash of the line.
+    tool_config_reference: The tool configuration, or its version, as sent to
+      the dubbers.
+    batch_id: The ID of the run, which the job IDs of the lines derive from.
+    split_languages: Whether to build one payload per target language.
+    media: The properties of the video of the line, as returned by
+      media_probe.probe, if it was checked.
+    coalesced_rows: The (row, row_hash, media) of the other lines of the job
+      of the line, as returned by _coalesce_rows, if any.
+
+  Returns:
+    The payload of every message to publish for the line.
+  """
+  coalesced_rows = coalesced_rows or []
+  payload = {
+      "worksheet_url": worksheet_url,
+      "line_config": row.to_dict(),
+      **tool_config_reference,
+      "status_columns": STATUS_COLUMNS,
+      "row_hash": row_hash,
+      "job_id": _job_id(
+          batch_id,
+          str(row.row_num),
+          row_hash,
+          *(
+              part
+              for coalesced_row, coalesced_row_hash, _ in coalesced_rows
+              for part in (str(coalesced_row.row_num), coalesced_row_hash)
+          ),
+      ),
+  }
+  if media:
+    payload["media"] = media
+  if coalesced_rows:
+    payload["coalesced_lines"] = [
+        {
+            "line_config": coalesced_row.to_dict(),
+            "row_hash": coalesced_row_hash,
+        }
+        for coalesced_row, coalesced_row_hash, _ in coalesced_rows
+    ]
+    return [payload]
+  return _split_by_language(payload) if split_languages else [payload]
+
+
+def _probe_videos(
+    rows: List[row_schema.DubbingRow],
+    probes: dict[str, Any],
+) -> None:
+  """Checks the videos of some lines not checked yet, a few at a time.
+
+  Args:
+    rows: The typed configuration of the lines.
+    probes: Dictionary with the result of media_probe.probe, or the exception
+      it raised, for every video_url already checked. The results of the new
+      videos are added to it.
+  """
+  video_urls = {row.video_url for row in rows} - probes.keys()
+  if not video_urls:
+    return
+
+  with concurrent.futures.ThreadPoolExecutor(
+      max_workers=min(PREFLIGHT_MAX_WORKERS, len(video_urls))
+  ) as executor:
+    futures = {
+        video_url: executor.submit(media_probe.probe, video_url)
+        for video_url in video_urls
+    }
+  for video_url, future in futures.items():
+    probes[video_url] = future.exception() or future.result()
+
+
+def _check_media(
+    row: row_schema.DubbingRow, probes: dict[str, Any]
+) -> dict[str, Any]:
+  """Checks that the video of a line can be dubbed.
+
+  Args:
+    row: The typed configuration of the line.
+    probes: Dictionary with the result of the check of every video, as filled
+      by _probe_videos.
+
+  Returns:
+    The properties of the video, as returned by media_probe.probe.
+
+  Raises:
+    Exception: The exception raised while checking the video.
+    ValueError: If the line is dubbed from its video, which has no audio.
+  """
+  media = probes[row.video_url]
+  if isinstance(media, Exception):
+    raise media
+  if media["has_audio"] is False and not _is_script_line(row):
+    raise ValueError(f"Video gs://{row.video_url} has no audio to dub.")
+  return media
+
+
+def _coalesce_rows(
+    rows: List[tuple[row_schema.DubbingRow, str, Any]], coalesce: bool = True
+) -> List[List[tuple[row_schema.DubbingRow, str, Any]]]:
+  """Groups the lines that can be dubbed as one job.
+
+  The lines dubbed from the same video whose configurations only differ in
+  COALESCED_KEYS are grouped, in the order of the sheet, so the dubber
+  prepares and transcribes the video once and dubs every language once (see
+  Dubber.dub_ad_with_different_language). The lines dubbed from a script are
+  never grouped.
+
+  Args:
+    rows: The (row, row_hash, media) of the lines.
+    coalesce: Whether to group the lines, every line being its own group
+      otherwise.
+
+  Returns:
+    The groups of (row, row_hash, media) tuples, in the order of their first
+    line.
+  """
+  if not coalesce:
+    return [[line] for line in rows]
+
+  groups = {}
+  for line in rows:
+    row = line[0]
+    key = (
+        json.dumps(
+            {
+                name: value
+                for name, value in row.to_dict().items()
+                if name not in COALESCED_KEYS
+            },
+            sort_keys=True,
+        )
+        if not _is_script_line(row)
+        else row.row_num
+    )
+    groups.setdefault(key, []).append(line)
+  return list(groups.values())
+
+
+def _job_row(
+    group: List[tuple[row_schema.DubbingRow, str, Any]],
+) -> row_schema.DubbingRow:
+  """Returns the configuration of the job of a group of lines.
+
+  Args:
+    group: The (row, row_hash, media) of the lines of the group, as returned
+      by _coalesce_rows.
+
+  Returns:
+    The row of the first line, with every target language of the group once.
+  """
+  if len(group) == 1:
+    return group[0][0]
+  return dataclasses.replace(
+      group[0][0],
+      target_language=list(
+          dict.fromkeys(
+              language
+              for row, _, _ in group
+              for language in row.target_language
+          )
+      ),
+  )
+
+
+def _estimate_line(
+    row: row_schema.DubbingRow,
+    media: Optional[dict[str, Any]],
+    split_languages: bool = False,
+    coalesced: bool = False,
+) -> Optional[dict[str, Any]]:
+  """Estimates the dubbing of a line, and whether its messages time out.
+
+  Args:
+    row: The typed configuration of the line, or of the job of coalesced
+      lines, as returned by _job_row.
+    media: The properties of the video of the line, as returned by
+      media_probe.probe, if it was checked.
+    split_languages: Whether the line is published as one message per target
+      language, each dubbed by its own dubber.
+    coalesced: Whether the row is the job of coalesced lines, published as
+      one message dubbing all the languages with the same Dubber.
+
+  Returns:
+    The estimate returned by dubbing_estimate.estimate, with the
+    "job_seconds" of the longest message of the line and whether it's
+    "over_timeout", or None if the dubbing of the line can't be estimated.
+  """
+  estimate = dubbing_estimate.estimate(
+      row, media["duration_seconds"] if media else None, coalesced
+  )
+  if estimate is None:
+    return None
+
+  job_seconds = (
+      estimate["seconds_per_language"]
+      if split_languages and not coalesced
+      else estimate["seconds"]
+  )
+  return {
+      **estimate,
+      "job_seconds": job_seconds,
+      "over_timeout": job_seconds > dubbing_estimate.timeout_seconds(),
+  }
+
+
+def _estimate_message(estimate: Optional[dict[str, Any]]) -> str:
+  """Returns the message of a published line, warning if it would time out.
+
+  Args:
+    estimate: The estimate of the line, as returned by _estimate_line.
+
+  Returns:
+    A warning if the messages of the line would take longer to dub than the
+    timeout of the dubber, an empty message otherwise.
+  """
+  if not estimate or not estimate["over_timeout"]:
+    return ""
+  return (
+      f"Estimated {estimate['job_seconds']}s of dubbing, over the"
+      f" {dubbing_estimate.timeout_seconds()}s timeout of the dubber."
+  )
+
+
+def _extra_values(
+    estimate: Optional[dict[str, Any]], planned_start_at: str = ""
+) -> List[Any]:
+  """Returns the values written after the status of a line.
+
+  Args:
+    estimate: The estimate of the line, as returned by _estimate_line.
+    planned_start_at: The time the line is planned to start at.
+
+  Returns:
+    The values of ESTIMATE_KEYS, empty without an estimate, and the planned
+    start time.
+  """
+  return [
+      *(estimate[key] if estimate else "" for key in ESTIMATE_KEYS),
+      planned_start_at,
+  ]
+
+
+def _api_usage(
+    row: row_schema.DubbingRow, estimate: Optional[dict[str, Any]]
+) -> dict[str, float]:
+  """Returns the estimated usage of every API by a line.
+
+  Args:
+    row: The typed configuration of the line.
+    estimate: The estimate of the line, as returned by _estimate_line.
+
+  Returns:
+    The usage of the APIs of admission.DEFAULT_QUOTAS_PER_MINUTE, empty
+    without an estimate.
+  """
+  if not estimate:
+    return {}
+  return {
+      admission.GEMINI_TOKENS: estimate["gemini_tokens"],
+      (
+          admission.ELEVENLABS_CHARACTERS
+          if dubbing_estimate.VOICE_PROVIDER_ELEVENLABS in row.voice_provider
+          else admission.GOOGLE_TTS_CHARACTERS
+      ): estimate["tts_characters"],
+  }
+
+
+def _planned_start_at(start: float) -> str:
+  """Formats a time.monotonic() time for the sheet."""
+  return (
+      datetime.now() + timedelta(seconds=max(0.0, start - time.monotonic()))
+  ).strftime(sheets_gateway.UPDATED_AT_FORMAT)
+
 
 def _publish_pubsub(
-    publisher_client: pubsub_v1.PublisherClient,
-    project_id: str,
-    pubsub_topic: str,
+    publisher_client: "pubsub_v1.PublisherClient",
+    topic_path: str,
     payload: dict[str, Any],
-):
-  """Publishes a message to a given Pub/Sub topic.
+    payload_store: Optional[state_store.StateStore] = None,
+) -> "pubsub_v1.publisher.futures.Future":
+  """Publishes a message to a given Pub/Sub topic without waiting for it.
+
+  The message is sent along with the other messages published in the
+  meantime, as set by the batch settings of the client.
 
   Args:
       publisher_client: A Pub/Sub publisher client instance.
-      project_id: Google Cloud project ID.
-      pubsub_topic: Name of the Pub/Sub topic to publish to.
+      topic_path: Path of the Pub/Sub topic to publish to.
       payload: The dictionary containing the message payload to publish.
+      payload_store: The state store large payloads are written to, with only
+        their claim check published. Payloads are always published as they
+        are when it's not set.
+
+  Returns:
+      The future resolved with the message ID once the message is published.
+  """
+  return publisher_client.publish(
+      topic_path,
+      data=claim_check.check_in(
+          bytes(json.dumps(payload), "utf-8"), payload_store
+      ),
+  )
+
+
+def _is_script_line(row: row_schema.DubbingRow) -> bool:
+  """Checks whether a line is dubbed from its script rather than its video.
+
+  Args:
+    row: The typed configuration of the line.
+
+  Returns:
+    True if the script of the line is not empty.
   """
-  topic_path_reporting = publisher_client.topic_path(project_id, pubsub_topic)
-  publisher_client.publish(
-      topic_path_reporting, data=bytes(json.dumps(payload), "utf-8")
-  ).result()
+  return bool(row.script)
+
 
+def _split_by_language(payload: dict[str, Any]) -> List[dict[str, Any]]:
+  """Splits the payload of a line into one payload per target language.
 
-def _init_google_sheet_client() -> gspread.Client:
-  """Initializes and authenticates a gspread client.
+  The payloads share a group, which the dubbers use to merge the results of
+  the languages into the status of the line once they are all dubbed. The
+  group ID is the job ID of the line, and the job ID of every language derives
+  from it.
 
-  This function sets up the necessary credentials and authorization
-  to interact with Google Sheets using the gspread library.
+  Args:
+    payload: The payload of the line.
 
   Returns:
-    A gspread.Client object authorized to access Google Sheets.
+    The payload of every target language of the line, or the payload itself
+    if the line has a single target language.
   """
-  scopes = [
-      "https://www.googleapis.com/auth/spreadsheets",
-      "https://www.googleapis.com/auth/drive",
-      "https://spreadsheets.google.com/feeds",
+  languages = payload["line_config"]["target_language"]
+  if len(languages) < 2:
+    return [payload]
+
+  return [
+      {
+          **payload,
+          "job_id": _job_id(payload["job_id"], language),
+          "line_config": {
+              **payload["line_config"],
+              "target_language": [language],
+          },
+          "group": {
+              "id": payload["job_id"],
+              "language": language,
+              "languages": languages,
+          },
+      }
+      for language in languages
   ]
 
-  credentials, _ = google.auth.default(scopes=scopes)
-  client = gspread.authorize(credentials)
 
-  return client
+def _job_id(*parts: str) -> str:
+  """Returns the deterministic ID of a job.
+
+  Args:
+    *parts: The values identifying the job.
+
+  Returns:
+    The hexadecimal SHA-256 hash of the values.
+  """
+  return hashlib.sha256(":".join(parts).encode("utf-8")).hexdigest()
+
+
+def _wait_for_publishing(
+    publish_futures: List[
+        tuple[int, List["pubsub_v1.publisher.futures.Future"]]
+    ],
+    worksheet_url: str,
+    logger: "logging.Logger",
+) -> List[tuple[int, str, str, str]]:
+  """Waits for the messages of the lines to be published.
+
+  Args:
+    publish_futures: List of (line number, futures) tuples, with the futures
+      returned by _publish_pubsub for every message of the line.
+    worksheet_url: The URL of the Google Sheet containing the configuration.
+    logger: logging.Logger object for logging events and errors.
+
+  Returns:
+    The (row, status, updated_at, message) FAILED status update of every line
+    with a message that failed to be published.
+  """
+  status_updates = []
+  for row_num, futures in publish_futures:
+    try:
+      for future in futures:
+        future.result(timeout=PUBLISH_TIMEOUT_SECONDS)
+    except Exception as e:
+      status_updates.append((
+          row_num + 2,
+          STATUS_FAILED,
+          sheets_gateway.now(),
+          _log_failure(logger, worksheet_url, e),
+      ))
+
+  return status_updates
+
+
+def _log_failure(
+    logger: "logging.Logger", worksheet_url: str, error: Exception
+) -> str:
+  """Logs the failure to process a line.
+
+  Args:
+    logger: logging.Logger object for logging events and errors.
+    worksheet_url: The URL of the Google Sheet containing the configuration.
+    error: The exception raised while processing the line.
+
+  Returns:
+    The message to write to the sheet for the line.
+  """
+  traceback.print_exception(error)
+  print(str(error))
+  logger.log(str(error))
+  logging_payload = {
+      "worksheet_url": worksheet_url if worksheet_url else None,
+      "status": FAILED_STATUS_FOR_REPORTING,
+      "message": (
+          str(error)
+          if len(str(error)) > 1
+          else "Check you shared the spreadsheet with the service account"
+      ),
+      "success": False,
+  }
+  logger.log_text(
+      f"{FAILED_STATUS_FOR_REPORTING}: {json.dumps(logging_payload)}"
+  )
+  return logging_payload["message"]
 
 
 def _read_tool_config_from_google_sheet(
     default_config: dict[str, str],
-    sheets_client: gspread.client,
-    worksheet_url: str,
-    config_sheet_name: str,
-) -> List[dict[str, Any]]:
-  """Reads the configuration parameters from a Google Sheet.
+    values: List[List[Any]],
+) -> dict[str, Any]:
+  """Reads the configuration parameters from the tool config tab.
 
   Args:
     default_config: A dictionary containing the default configuration
       parameters.
-    sheets_client: gspread client object.
-    worksheet_url: The URL of the Google Sheet containing the configuration.
-    config_sheet_name: The name of the sheet in the Google Sheet containing the
-      configuration.
+    values: The values of the tool config tab, header row included.
 
   Returns:
-    A a list of dictionary containing the configuration parameters.
+    A dictionary containing the configuration parameters.
   """
-  data = _load_data_from_google_sheet(
-      worksheet_url, config_sheet_name, sheets_client, skip_rows=0
+  variable_column, value_column = _build_column_index(
+      values[0] if values else [], ("variable", "value")
   )
-  for i, k in enumerate(data.variable):
-    default_config[k] = data.value[i]
+  for row in itertools.islice(values, 1, None):
+    default_config[_cell(row, variable_column)] = _cell(row, value_column)
 
   return default_config
 
 
 def _read_dubbing_config_from_google_sheet(
     default_config: dict[str, str],
-    sheets_client: gspread.client,
-    worksheet_url: str,
-    config_sheet_name: str,
-) -> List[dict[str, str]]:
-  """Reads the configuration parameters from a Google Sheet.
+    header: List[Any],
+    rows: Iterable[tuple[int, List[Any]]],
+    force: bool = False,
+    filters: Optional[dict[str, set[str]]] = None,
+    skipped: Optional[List[tuple[int, str]]] = None,
+) -> Iterator[tuple[int, str, tuple[str, ...]]]:
+  """Streams the dubbing configuration of the lines of the dubbing config tab.
+
+  The position of every configuration parameter in the header row is resolved
+  once, and each row is yielded as a tuple with one value per key of
+  default_config, in the same order, falling back to the default value for
+  the missing or empty cells. Empty rows are skipped, and so are the rows
+  already processed unless force is set (see _needs_processing) and the rows
+  not matching the filters.
 
   Args:
     default_config: A dictionary containing the default configuration
       parameters.
-    sheets_client: gspread client object.
-    worksheet_url: The URL of the Google Sheet containing the configuration.
-    config_sheet_name: The name of the sheet in the Google Sheet containing the
-      configuration.
+    header: The header row of the dubbing config tab.
+    rows: Iterable of (line number, values) tuples, where the line number
+      starts at 0 for the first row after the header.
+    force: Whether to yield every line regardless of its status.
+    filters: Dictionary with the accepted values of some of the configuration
+      parameters, as returned by _parse_filters.
+    skipped: List the (line number, reason) tuples of the skipped non empty
+      rows are appended to, if any.
+
+  Yields:
+    A tuple with the line number, the current status of the line in upper
+    case and a tuple with the configuration parameters of the line.
+  """
+  columns = tuple(
+      zip(_build_column_index(header, default_config), default_config.values())
+  )
+  keys = list(default_config)
+  filter_positions = [
+      (key, keys.index(key), accepted)
+      for key, accepted in (filters or {}).items()
+  ]
+
+  for row_num, row in rows:
+    if not any(str(value) for value in row):
+      continue
+    if not force and not _needs_processing(row):
+      if skipped is not None:
+        skipped.append((row_num, f"status {_row_status(row)}"))
+      continue
+    line_values = tuple(
+        _cell(row, column) or default for column, default in columns
+    )
+    if all(
+        _matches_filter(key, line_values[position], accepted)
+        for key, position, accepted in filter_positions
+    ):
+      yield row_num, _row_status(row), line_values
+    elif skipped is not None:
+      skipped.append((row_num, "filtered out"))
+
+
+def _needs_processing(row: List[Any]) -> bool:
+  """Checks whether a row has to be published in an incremental run.
+
+  New rows, failed rows, deferred rows and rows flagged with the RERUN status
+  are processed.
+  Rows that are OK, or PROCESSING since less than PROCESSING_TIMEOUT_SECONDS,
+  are not.
+
+  Args:
+    row: The unformatted values of the row.
 
   Returns:
-    A list of dictionary containing the configuration parameters.
+    True if the row has to be published, False otherwise.
   """
-  data = _load_data_from_google_sheet(
-      worksheet_url, config_sheet_name, sheets_client, skip_rows=0
+  status = _row_status(row)
+  if status in INCREMENTAL_STATUSES:
+    return True
+  if status != STATUS_PROCESSING:
+    return False
+
+  try:
+    updated_at = datetime.strptime(
+        _cell(row, UPDATED_AT_COLUMN_INDEX).strip(),
+        sheets_gateway.UPDATED_AT_FORMAT,
+    )
+  except ValueError:
+    return False
+  return (
+      datetime.now() - updated_at
+  ).total_seconds() > PROCESSING_TIMEOUT_SECONDS
+
+
+def _row_status(row: List[Any]) -> str:
+  """Returns the status of a row in upper case."""
+  return _cell(row, STATUS_COLUMN_INDEX).strip().upper()
+
+
+def _hash_line_config(line_config: dict[str, str]) -> str:
+  """Computes a stable hash of the effective configuration of a line.
+
+  Args:
+    line_config: The configuration of the line, with the defaults applied.
+
+  Returns:
+    The hex SHA-256 digest of the configuration, UNHASHED_KEYS excluded.
+  """
+  content = {
+      key: value
+      for key, value in line_config.items()
+      if key not in UNHASHED_KEYS
+  }
+  return hashlib.sha256(
+      json.dumps(content, sort_keys=True).encode("utf-8")
+  ).hexdigest()
+
+
+def _load_run_index(
+    store: Optional[state_store.StateStore], worksheet_url: str
+) -> dict[str, dict[str, str]]:
+  """Loads the successful runs of a spreadsheet from the run index.
+
+  Args:
+    store: The state store holding the run index, or None if there is none.
+    worksheet_url: The URL of the Google Sheet.
+
+  Returns:
+    A dictionary with the metadata of the run of each line content hash.
+  """
+  if not store:
+    return {}
+
+  prefix = state_store.run_index_prefix(
+      gspread.utils.extract_id_from_url(worksheet_url)
   )
-  lines = []
+  return {
+      key[len(prefix) :]: metadata for key, metadata in store.list(prefix)
+  }
+
 
-  for index, row in data.iterrows():
-    line = {}
-    for k in default_config.keys():
-      line[k] = default_config[k] if (k not in row or not row[k]) else row[k]
-    lines.append(line)
+def _build_column_index(
+    header: List[Any], keys: Iterable[str]
+) -> tuple[Optional[int], ...]:
+  """Maps each key to the position of its column in the header row.
 
-  return lines
+  Args:
+    header: The header row of a tab.
+    keys: The names of the columns to look up.
 
+  Returns:
+    A tuple with the position of the column of each key, or None when the
+    column is not present in the header row.
+  """
+  positions = {}
+  for position, name in enumerate(header):
+    positions.setdefault(str(name), position)
 
-def _load_data_from_google_sheet(
+  return tuple(positions.get(key) for key in keys)
+
+
+def _cell(row: List[Any], column: Optional[int]) -> str:
+  """Returns the value of a cell as a string.
+
+  Unformatted reads omit the trailing empty cells of every row, and return
+  numbers and booleans with their own types, while the rest of the tool
+  expects the same strings a formatted read would return.
+
+  Args:
+    row: The unformatted values of the row.
+    column: The position of the cell in the row, or None.
+
+  Returns:
+    The value of the cell as a string, or an empty string when it's missing.
+  """
+  if column is None or column >= len(row):
+    return ""
+  return str(row[column])
+
+
+def _read_dubbing_rows_from_google_sheet(
+    url: str,
+    tool_config_sheet_name: str,
+    dubbing_config_sheet_name: str,
+    row_ranges: Optional[List[tuple[int, int]]],
+    filters: dict[str, set[str]],
+    sheets_cache: sheets_gateway.WorksheetCache,
+    read_first_window: bool = True,
+) -> tuple[
+    dict[str, Any], List[Any], Iterator[List[tuple[int, List[Any]]]]
+]:
+  """Reads the tool config and the selected rows of the dubbing config tab.
+
+  The rows are read in windows of at most ROW_WINDOW_SIZE rows, using A1
+  ranges, and the next window is only fetched once the previous one has been
+  consumed, so memory stays flat however big the tab is. The first window is
+  read together with the tool config, unless read_first_window is False.
+  Without a selection every row is read.
+  When only filters are set, the columns of the filtered parameters are read
+  first to find the matching rows.
+
+  Args:
+    url: The URL of the Google Sheet.
+    tool_config_sheet_name: The name of the tool config tab.
+    dubbing_config_sheet_name: The expected name of the dubbing config tab.
+    row_ranges: Sorted list of (first, last) sheet row numbers to read, or
+      None to read every row.
+    filters: Dictionary with the accepted values of some of the configuration
+      parameters, as returned by _parse_filters.
+    sheets_cache: Cache of the spreadsheet and worksheet handles.
+    read_first_window: Whether to read the first window together with the tool
+      config, instead of once the iterator is first advanced, like the others.
+      A run taking the submission lock after reading the tool config reads its
+      rows only once it holds the lock.
+
+  Returns:
+    A tuple with the tool configuration parameters, the header row of the
+    dubbing config tab and an iterator of windows, each a list of
+    (line number, values) tuples.
+  """
+  if (row_ranges is None and filters) or not read_first_window:
+    tool_config, (header_values,) = _read_config_from_google_sheet(
+        url,
+        tool_config_sheet_name,
+        dubbing_config_sheet_name,
+        [_header_range()],
+        sheets_cache,
+    )
+    windows = _split_row_windows(
+        _find_rows_matching_filters(
+            url,
+            tool_config["DUBBING_CONFIG"],
+            header_values[0] if header_values else [],
+            filters,
+            sheets_cache,
+        )
+        if row_ranges is None and filters
+        else row_ranges or [(2, sys.maxsize)],
+        ROW_WINDOW_SIZE,
+    )
+    first_window, first_values = None, None
+  else:
+    windows = _split_row_windows(
+        row_ranges or [(2, sys.maxsize)], ROW_WINDOW_SIZE
+    )
+    first_window = next(windows)
+    tool_config, (header_values, *first_values) = (
+        _read_config_from_google_sheet(
+            url,
+            tool_config_sheet_name,
+            dubbing_config_sheet_name,
+            [_header_range()]
+            + [_rows_range(first, last) for first, last in first_window],
+            sheets_cache,
+        )
+    )
+
+  return (
+      tool_config,
+      header_values[0] if header_values else [],
+      _read_row_windows(
+          url,
+          tool_config["DUBBING_CONFIG"],
+          windows,
+          sheets_cache,
+          first_window,
+          first_values,
+      ),
+  )
+
+
+def _read_row_windows(
     url: str,
     worksheet_name: str,
-    sheets_client: gspread.Client,
-    skip_rows: int = 0,
-) -> pd.DataFrame:
-  """Loads data from a Google Sheet to pandas dataframe.
+    windows: Iterator[List[tuple[int, int]]],
+    sheets_cache: sheets_gateway.WorksheetCache,
+    first_window: Optional[List[tuple[int, int]]] = None,
+    first_values: Optional[List[List[List[Any]]]] = None,
+) -> Iterator[List[tuple[int, List[Any]]]]:
+  """Reads windows of rows of the dubbing config tab, one call per window.
+
+  Reading stops at the last row of the tab.
 
   Args:
     url: The URL of the Google Sheet.
-    worksheet_name: The name of the worksheet to load data from.
-    sheets_client: A gspread.Client object.
-    skip_rows: The number of rows to skip from the beginning of the sheet.
+    worksheet_name: The name of the dubbing config tab.
+    windows: Iterator of the windows to read, each a list of (first, last)
+      sheet row numbers.
+    sheets_cache: Cache of the spreadsheet and worksheet handles.
+    first_window: The row ranges of a window already read, if any.
+    first_values: The values of each range of first_window.
+
+  Yields:
+    A list of (line number, values) tuples with the rows of each window.
+  """
+  if first_window is not None:
+    yield _number_window_rows(first_window, first_values)
+
+  row_count = None
+  for window in windows:
+    if row_count is None:
+      row_count = sheets_cache.worksheet(url, worksheet_name).row_count
+    window = [
+        (first, min(last, row_count))
+        for first, last in window
+        if first <= row_count
+    ]
+    if not window:
+      return
+    yield _number_window_rows(
+        window,
+        _load_data_from_google_sheet(
+            url,
+            [
+                gspread.utils.absolute_range_name(
+                    worksheet_name, _rows_range(first, last)
+                )
+                for first, last in window
+            ],
+            sheets_cache,
+        ),
+    )
+
+
+def _number_window_rows(
+    window: List[tuple[int, int]], values: List[List[List[Any]]]
+) -> List[tuple[int, List[Any]]]:
+  """Numbers the rows read for a window.
+
+  Args:
+    window: List of the (first, last) sheet row numbers of the window.
+    values: The values of each range of the window.
 
   Returns:
-    A pandas DataFrame containing the data from the specified Google Sheet.
+    A list of (line number, values) tuples.
+  """
+  return list(
+      itertools.chain.from_iterable(
+          _number_rows(range_values, first)
+          for (first, _), range_values in zip(window, values)
+      )
+  )
+
+
+def _split_row_windows(
+    row_ranges: List[tuple[int, int]], window_size: int
+) -> Iterator[List[tuple[int, int]]]:
+  """Splits row ranges in windows with at most window_size rows each.
+
+  Args:
+    row_ranges: Sorted list of (first, last) sheet row numbers. The last row
+      is sys.maxsize for ranges without limit.
+    window_size: The maximum number of rows of a window.
+
+  Yields:
+    A list of (first, last) sheet row numbers for each window.
+  """
+  window, remaining = [], window_size
+  for first, last in row_ranges:
+    while first <= last:
+      window_last = min(last, first + remaining - 1)
+      window.append((first, window_last))
+      remaining -= window_last - first + 1
+      first = window_last + 1
+      if not remaining:
+        yield window
+        window, remaining = [], window_size
+  if window:
+    yield window
+
+
+def _read_config_from_google_sheet(
+    url: str,
+    tool_config_sheet_name: str,
+    dubbing_config_sheet_name: str,
+    dubbing_config_ranges: List[str],
+    sheets_cache: sheets_gateway.WorksheetCache,
+) -> tuple[dict[str, Any], List[List[List[Any]]]]:
+  """Reads the tool config and ranges of the dubbing config tab.
+
+  The name of the dubbing config tab is defined inside the tool config tab, so
+  both tabs are fetched in a single call using the expected dubbing config tab
+  name, and the dubbing config ranges are fetched again only if the tool
+  config points somewhere else.
+
+  Args:
+    url: The URL of the Google Sheet.
+    tool_config_sheet_name: The name of the tool config tab.
+    dubbing_config_sheet_name: The expected name of the dubbing config tab.
+    dubbing_config_ranges: The A1 ranges to read from the dubbing config tab.
+    sheets_cache: Cache of the spreadsheet and worksheet handles.
+
+  Returns:
+    A tuple with the tool configuration parameters and the values of each of
+    the dubbing config ranges.
+  """
+  tool_config_range = gspread.utils.absolute_range_name(
+      tool_config_sheet_name, SHEET_COLUMNS
+  )
+  try:
+    tool_values, *dubbing_values = _load_data_from_google_sheet(
+        url,
+        [tool_config_range]
+        + [
+            gspread.utils.absolute_range_name(dubbing_config_sheet_name, range_)
+            for range_ in dubbing_config_ranges
+        ],
+        sheets_cache,
+    )
+  except gspread.exceptions.APIError as e:
+    if not _is_unknown_range(e):
+      raise
+    # The expected dubbing config tab doesn't exist in this spreadsheet.
+    (tool_values,) = _load_data_from_google_sheet(
+        url, [tool_config_range], sheets_cache
+    )
+    dubbing_values = None
+
+  tool_config = _read_tool_config_from_google_sheet({}, tool_values)
+  if dubbing_values is None or (
+      tool_config["DUBBING_CONFIG"] != dubbing_config_sheet_name
+  ):
+    dubbing_values = _load_data_from_google_sheet(
+        url,
+        [
+            gspread.utils.absolute_range_name(
+                tool_config["DUBBING_CONFIG"], range_
+            )
+            for range_ in dubbing_config_ranges
+        ],
+        sheets_cache,
+    )
+
+  return tool_config, dubbing_values
+
+
+def _is_unknown_range(error: gspread.exceptions.APIError) -> bool:
+  """Checks whether a request failed because a range names a missing tab.
+
+  Args:
+    error: The error raised by the Sheets API.
+
+  Returns:
+    True for the 400 "Unable to parse range" error, False for any other error,
+    such as a permission error or a quota error left after the retries of the
+    gateway.
+  """
+  return error.code == 400 and UNKNOWN_RANGE_ERROR in str(
+      error.error.get("message", "")
+  )
+
+
+def _find_rows_matching_filters(
+    url: str,
+    worksheet_name: str,
+    header: List[Any],
+    filters: dict[str, set[str]],
+    sheets_cache: sheets_gateway.WorksheetCache,
+) -> List[tuple[int, int]]:
+  """Finds the rows of the dubbing config tab matching the filters.
+
+  Only the columns of the filtered parameters are read.
+
+  Args:
+    url: The URL of the Google Sheet.
+    worksheet_name: The name of the dubbing config tab.
+    header: The header row of the dubbing config tab.
+    filters: Dictionary with the accepted values of some of the configuration
+      parameters, as returned by _parse_filters.
+    sheets_cache: Cache of the spreadsheet and worksheet handles.
+
+  Returns:
+    Sorted list of (first, last) sheet row numbers of the matching rows.
+  """
+  keys = list(filters)
+  columns = _build_column_index(header, keys)
+  missing = [key for key, column in zip(keys, columns) if column is None]
+  if not all(
+      _matches_filter(key, DEFAULT_DUBBING_CONFIG[key], filters[key])
+      for key in missing
+  ):
+    return []
+
+  present = [
+      (key, column)
+      for key, column in zip(keys, columns)
+      if column is not None
+  ]
+  if not present:
+    # None of the filtered parameters has a column, every row matches.
+    return [(2, sys.maxsize)]
+
+  column_values = _load_data_from_google_sheet(
+      url,
+      [
+          gspread.utils.absolute_range_name(
+              worksheet_name, _column_range(column)
+          )
+          for _, column in present
+      ],
+      sheets_cache,
+  )
+
+  rows = []
+  for row_num in range(max(len(values) for values in column_values)):
+    if all(
+        _matches_filter(
+            key,
+            _cell(
+                values[row_num] if row_num < len(values) else [], 0
+            )
+            or DEFAULT_DUBBING_CONFIG[key],
+            filters[key],
+        )
+        for (key, _), values in zip(present, column_values)
+    ):
+      rows.append((row_num + 2, row_num + 2))
+
+  return _merge_row_ranges(rows)
+
+
+def _matches_filter(key: str, value: str, accepted: set[str]) -> bool:
+  """Checks whether the value of a configuration parameter passes a filter.
+
+  Args:
+    key: The name of the configuration parameter.
+    value: The value of the parameter in a line.
+    accepted: The values accepted by the filter.
+
+  Returns:
+    True if the value is accepted. For target_language, which holds a list of
+    languages, True if any of them is accepted.
+  """
+  if key == "target_language":
+    return any(language in accepted for language in _parse_list(value))
+  return value in accepted
+
+
+def _parse_list(value: str) -> List[str]:
+  """Parses a cell holding a list, like target_language.
+
+  Args:
+    value: The value of the cell.
+
+  Returns:
+    The items of the list as strings. A value that is not a list is returned
+    as a list with a single item.
+  """
+  try:
+    items = ast.literal_eval(value)
+  except (ValueError, SyntaxError):
+    return [value]
+  if isinstance(items, (list, tuple)):
+    return [str(item) for item in items]
+  return [str(items)]
+
+
+def _parse_row_selection(
+    request_json: dict[str, Any],
+) -> Optional[List[tuple[int, int]]]:
+  """Parses the rows selected in the body of the request.
+
+  Rows are selected with sheet row numbers, 2 being the first row after the
+  header, either with "row_ranges", a list of [first, last] pairs or
+  "first-last" strings, or with "row_numbers", a list of single rows.
+
+  Args:
+    request_json: The body of the request.
+
+  Returns:
+    The sorted list of (first, last) row numbers to read, or None if no row
+    is selected.
 
   Raises:
-    Exception: If there is an error loading data from the Google Sheet.
+    ValueError: If a range is not valid.
   """
+  row_ranges = []
+  for row_range in request_json.get("row_ranges", []):
+    if isinstance(row_range, str):
+      first, _, last = row_range.partition("-")
+      row_range = (first, last or first)
+    first, last = (int(row) for row in row_range)
+    row_ranges.append((first, last))
+  for row in request_json.get("row_numbers", []):
+    row_ranges.append((int(row), int(row)))
 
-  input_sheet = sheets_client.open_by_url(url)
+  if not row_ranges:
+    return None
+  for first, last in row_ranges:
+    if first < 2 or last < first:
+      raise ValueError(f"Invalid row range {first}-{last}.")
+
+  return _merge_row_ranges(row_ranges)
+
+
+def _parse_filters(request_json: dict[str, Any]) -> dict[str, set[str]]:
+  """Parses the filters set in the body of the request.
+
+  Args:
+    request_json: The body of the request. Its "filters" entry maps some of
+      FILTER_KEYS to a value or a list of accepted values.
+
+  Returns:
+    A dictionary with the set of accepted values of each filtered parameter.
+
+  Raises:
+    ValueError: If a filter is not supported.
+  """
+  filters = {}
+  for key, accepted in request_json.get("filters", {}).items():
+    if key not in FILTER_KEYS:
+      raise ValueError(f"Unsupported filter {key}.")
+    if isinstance(accepted, str):
+      accepted = [accepted]
+    filters[key] = {str(value) for value in accepted}
+
+  return filters
+
+
+def _merge_row_ranges(
+    row_ranges: List[tuple[int, int]],
+) -> List[tuple[int, int]]:
+  """Sorts row ranges and merges the overlapping or adjacent ones.
+
+  Args:
+    row_ranges: List of (first, last) row numbers.
+
+  Returns:
+    The sorted list of disjoint (first, last) row numbers.
+  """
+  merged = []
+  for first, last in sorted(row_ranges):
+    if merged and first <= merged[-1][1] + 1:
+      merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+    else:
+      merged.append((first, last))
+
+  return merged
+
+
+def _number_rows(
+    values: Iterable[List[Any]], first_row: int
+) -> Iterator[tuple[int, List[Any]]]:
+  """Numbers the rows read from a range of the dubbing config tab.
+
+  Args:
+    values: The rows of values of the range.
+    first_row: The sheet row number of the first row of the range.
+
+  Yields:
+    A tuple with the line number, starting at 0 for the first row after the
+    header, and the values of the row.
+  """
+  for row_num, row in enumerate(values, first_row - 2):
+    yield row_num, row
+
+
+def _header_range() -> str:
+  """Returns the A1 range of the header row, estimate columns included."""
+  first_column = SHEET_COLUMNS.split(":")[0]
+  last_cell = gspread.utils.rowcol_to_a1(
+      1, ESTIMATE_COLUMN_INDEX + len(ESTIMATE_HEADERS)
+  )
+  return f"{first_column}1:{last_cell}"
 
-  if worksheet_name:
-    values = input_sheet.worksheet(worksheet_name).get_all_values()
-  else:
-    values = input_sheet.sheet1.get_all_values()
 
-  return pd.DataFrame.from_records(
-      values[skip_rows + 1 :], columns=values[skip_rows]
-  )
\ No newline at end of file
+def _rows_range(first: int, last: int) -> str:
+  """Returns the A1 range of some rows, limited to the SHEET_COLUMNS columns.
+
+  Args:
+    first: The sheet row number of the first row.
+    last: The sheet row number of the last row, sys.maxsize for no limit.
+
+  Returns:
+    The A1 range.
+  """
+  first_column, last_column = SHEET_COLUMNS.split(":")
+  return (
+      f"{first_column}{first}:{last_column}"
+      f"{'' if last == sys.maxsize else last}"
+  )
+
+
+def _column_range(column: int) -> str:
+  """Returns the A1 range of a column, header row excluded.
+
+  Args:
+    column: The position of the column, starting at 0.
+
+  Returns:
+    The A1 range.
+  """
+  letter = gspread.utils.rowcol_to_a1(1, column + 1)[:-1]
+  return f"{letter}2:{letter}"
+
+
+def _load_data_from_google_sheet(
+    url: str,
+    ranges: List[str],
+    sheets_cache: sheets_gateway.WorksheetCache,
+) -> List[List[List[Any]]]:
+  """Loads data from several ranges of a Google Sheet.
+
+  All the ranges are read in a single values batch get call, without
+  formatting the values.
+
+  Args:
+    url: The URL of the Google Sheet.
+    ranges: The absolute A1 ranges to load data from.
+    sheets_cache: Cache of the spreadsheet and worksheet handles.
+
+  Returns:
+    A list with the rows of values of each range.
+
+  Raises:
+    Exception: If there is an error loading data from the Google Sheet.
+  """
+
+  response = sheets_cache.values_batch_get(
+      url, ranges, params={"valueRenderOption": "UNFORMATTED_VALUE"}
+  )
+
+  return [
+      value_range.get("values", []) for value_range in response["valueRanges"]
+  ]
@@ -0,0 +1 @@
+../common/media_probe.py
\ No newline at end of file
@@ -0,0 +1 @@
+../common/row_schema.py
\ No newline at end of file
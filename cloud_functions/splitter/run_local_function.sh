@@ -20,6 +20,8 @@ export PROJECT_ID="<SET_PROJECT_HERE>"
 export REGION="us-central1"
 export SERVICE_ACCOUNT="<SET_SA_HERE>"
 export PUBSUB_TOPIC="ariel_dub_video"
+export SCRIPT_PUBSUB_TOPIC="ariel_dub_script"
+export STATE_STORE_URI="/tmp/ariel_state"
 
 #cp -R ../../lib ./
 
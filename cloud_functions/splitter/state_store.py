@@ -0,0 +1 @@
+../common/state_store.py
\ No newline at end of file
@@ -0,0 +1,241 @@
+"""Google Cloud function that writes the dubbers status events to the sheets."""
+
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import sys
+import time
+import traceback
+from typing import Any, List
+import flask
+import functions_framework
+from google.api_core import exceptions
+from google.cloud import logging
+from google.cloud import pubsub_v1
+import sheets_gateway
+import status_events
+
+FAILED_STATUS_FOR_REPORTING = "ERROR_IN_ARIEL_STATUS_AGGREGATOR"
+CF_NAME = "ariel_status_aggregator"
+
+# How long a single invocation keeps pulling events. The function is invoked
+# every minute by Cloud Scheduler.
+RUN_SECONDS = 50
+
+# How often the buffered events of every worksheet are written.
+FLUSH_INTERVAL_SECONDS = 5
+
+# Maximum number of events pulled at a time.
+MAX_MESSAGES = 1000
+
+# Maximum number of ack IDs sent in a single acknowledge call.
+ACK_BATCH_SIZE = 1000
+
+
+@functions_framework.http
+def run(request: flask.Request) -> flask.Response:
+  """HTTP Cloud Function.
+
+  Pulls the status events published by the dubbers for RUN_SECONDS, buffers
+  them per worksheet and writes them to the sheets every
+  FLUSH_INTERVAL_SECONDS, one batched call per worksheet.
+
+  Args:
+      request (flask.Request): The request object.
+        <https://flask.palletsprojects.com/en/1.1.x/api/#incoming-request-data>
+
+  Returns:
+      The response text, or any set of values that can be turned into a
+      Response object using `make_response`
+      <https://flask.palletsprojects.com/en/1.1.x/api/#flask.make_response>.
+  """
+
+  logging_client = logging.Client()
+  log_name = os.environ["DEPLOYMENT_NAME"] + CF_NAME
+  logger = logging_client.logger(log_name)
+
+  required_elem = [
+      "PROJECT_ID",
+      "DEPLOYMENT_NAME",
+      "STATUS_SUBSCRIPTION",
+  ]
+  if not all(elem in os.environ for elem in required_elem):
+    logger.log_text(
+        f"{FAILED_STATUS_FOR_REPORTING}: Cannot proceed, there are missing"
+        " input values please make sure you set all the environment variables"
+        " correctly."
+    )
+
+    sys.exit(1)
+
+  try:
+
+    subscriber_client = pubsub_v1.SubscriberClient()
+    subscription_path = subscriber_client.subscription_path(
+        os.environ["PROJECT_ID"], os.environ["STATUS_SUBSCRIPTION"]
+    )
+    gateway = sheets_gateway.get_gateway()
+    sheets_cache = sheets_gateway.WorksheetCache(gateway)
+
+    events = _aggregate_events(
+        subscriber_client, subscription_path, sheets_cache, logger
+    )
+    print(
+        f"{events} status events written. Sheets API usage of the instance:"
+        f" {json.dumps(gateway.stats())}"
+    )
+
+    return "OK", 200
+
+  except Exception as e:
+    traceback.print_exc()
+    return f"Error {e}", 500
+
+
+def _aggregate_events(
+    subscriber_client: pubsub_v1.SubscriberClient,
+    subscription_path: str,
+    sheets_cache: sheets_gateway.WorksheetCache,
+    logger: logging.Logger,
+) -> int:
+  """Pulls, buffers and writes the status events for RUN_SECONDS.
+
+  Args:
+    subscriber_client: A Pub/Sub subscriber client instance.
+    subscription_path: The path of the status events subscription.
+    sheets_cache: Cache of the spreadsheet and worksheet handles.
+    logger: logging.Logger object for logging events and errors.
+
+  Returns:
+    The number of status events written.
+  """
+  deadline = time.monotonic() + RUN_SECONDS
+  next_flush = time.monotonic() + FLUSH_INTERVAL_SECONDS
+  buffer = {}
+  written = 0
+
+  while time.monotonic() < deadline:
+    try:
+      response = subscriber_client.pull(
+          request={
+              "subscription": subscription_path,
+              "max_messages": MAX_MESSAGES,
+          },
+          timeout=FLUSH_INTERVAL_SECONDS,
+      )
+      received_messages = response.received_messages
+    except exceptions.DeadlineExceeded:
+      received_messages = []
+
+    for received_message in received_messages:
+      try:
+        event = json.loads(received_message.message.data.decode("utf-8"))
+        worksheet = (event["worksheet_url"], event["worksheet_name"])
+      except (ValueError, KeyError, TypeError) as e:
+        # A malformed event would fail again on every delivery, so it's
+        # acknowledged rather than blocking the events pulled with it.
+        logging_payload = {
+            "message_id": received_message.message.message_id,
+            "status": FAILED_STATUS_FOR_REPORTING,
+            "message": f"Malformed status event: {e!r}",
+            "success": False,
+        }
+        logger.log_text(
+            f"{FAILED_STATUS_FOR_REPORTING}: {json.dumps(logging_payload)}"
+        )
+        subscriber_client.acknowledge(
+            request={
+                "subscription": subscription_path,
+                "ack_ids": [received_message.ack_id],
+            }
+        )
+        continue
+      events, ack_ids = buffer.setdefault(worksheet, ([], []))
+      events.append(event)
+      ack_ids.append(received_message.ack_id)
+
+    if time.monotonic() >= next_flush:
+      written += _flush_events(
+          subscriber_client, subscription_path, buffer, sheets_cache, logger
+      )
+      buffer = {}
+      next_flush = time.monotonic() + FLUSH_INTERVAL_SECONDS
+
+  return written + _flush_events(
+      subscriber_client, subscription_path, buffer, sheets_cache, logger
+  )
+
+
+def _flush_events(
+    subscriber_client: pubsub_v1.SubscriberClient,
+    subscription_path: str,
+    buffer: dict[tuple[str, str], tuple[List[dict[str, Any]], List[str]]],
+    sheets_cache: sheets_gateway.WorksheetCache,
+    logger: logging.Logger,
+) -> int:
+  """Writes the buffered events of every worksheet and acknowledges them.
+
+  The events of a worksheet that can't be written are negatively
+  acknowledged, so they are delivered again.
+
+  Args:
+    subscriber_client: A Pub/Sub subscriber client instance.
+    subscription_path: The path of the status events subscription.
+    buffer: The events and ack IDs of every (URL, worksheet name) pair.
+    sheets_cache: Cache of the spreadsheet and worksheet handles.
+    logger: logging.Logger object for logging events and errors.
+
+  Returns:
+    The number of status events written.
+  """
+  written = 0
+
+  for (worksheet_url, _), (events, ack_ids) in buffer.items():
+    try:
+      status_events.write(events, sheets_cache)
+      written += len(events)
+    except Exception as e:
+      traceback.print_exc()
+      logging_payload = {
+          "worksheet_url": worksheet_url,
+          "status": FAILED_STATUS_FOR_REPORTING,
+          "message": str(e),
+          "success": False,
+      }
+      logger.log_text(
+          f"{FAILED_STATUS_FOR_REPORTING}: {json.dumps(logging_payload)}"
+      )
+      for start in range(0, len(ack_ids), ACK_BATCH_SIZE):
+        subscriber_client.modify_ack_deadline(
+            request={
+                "subscription": subscription_path,
+                "ack_ids": ack_ids[start : start + ACK_BATCH_SIZE],
+                "ack_deadline_seconds": 0,
+            }
+        )
+      continue
+
+    for start in range(0, len(ack_ids), ACK_BATCH_SIZE):
+      subscriber_client.acknowledge(
+          request={
+              "subscription": subscription_path,
+              "ack_ids": ack_ids[start : start + ACK_BATCH_SIZE],
+          }
+      )
+
+  return written
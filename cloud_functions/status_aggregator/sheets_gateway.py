@@ -0,0 +1 @@
+../common/sheets_gateway.py
\ No newline at end of file
@@ -26,7 +26,7 @@ eval "$(cat ${CONFIG_PATH} | sed -e 's/ *= */=/g')"
 
 curl localhost:8080   -X POST   -H "Content-Type: application/json"   -H "ce-id: 123451234512345"   -H "ce-specversion: 1.0"   -H "ce-time: 2020-01-02T12:34:56.789Z"   -H "ce-type: google.cloud.pubsub.topic.v1.messagePublished"  -H "ce-source: //pubsub.googleapis.com/projects/${PROJECT_ID}/topics/${PUBSUB_TOPIC}"  -d '{
     "message": {
-          "data": "eyJ3b3Jrc2hlZXRfdXJsIjogImh0dHBzOi8vZG9jcy5nb29nbGUuY29tL3NwcmVhZHNoZWV0cy9kLzFQOGRCM2V4TndQS09DcE1sTmtEU1laVi16WlFFek1mODllNmU3MUdPYmdjIiwgImxpbmVfY29uZmlnIjogeyJjYW1wYWlnbl9uYW1lIjogInRlc3RfY2FtcGFpZ24iLCAiY3VzdG9tX3RhZyI6ICJtdWx0aV9zcGVha2VyX3NjcmlwdF9nb29nbGVfbXVsdGlfbGFuZ3VhZ2UiLCAib3JpZ2luYWxfbGFuZ3VhZ2UiOiAiZW4tVVMiLCAidGFyZ2V0X2xhbmd1YWdlIjogIltcImVuLVVTXCIsIFwiZW4tR0JcIiwgXCJlcy1FU1wiXSIsICJ2aWRlb191cmwiOiAibXktYXJpZWwtYnVja2V0L3NhbXBsZS9nbG92b2Jhc2V2aWRlby5tcDQiLCAic2NyaXB0IjogIltcbiAge1wic3RhcnRcIjogMC45LCBcImVuZFwiOiAyLjMsIFwidGV4dFwiOiBcIlBpenphIGxvdmVyP1wifSxcbiAge1wic3RhcnRcIjogMi41LCBcImVuZFwiOiA0LjAsIFwidGV4dFwiOiBcIkRpc2NvdW50cyBsb3Zlcj9cIn0sXG4gIHtcInN0YXJ0XCI6IDQuMCwgXCJlbmRcIjogNy4wLCBcInRleHRcIjogXCJTYXRpc2Z5IHlvdXIgZmllcmNlIHBpenphIGNyYXZpbmchXCJ9LFxuICB7XCJzdGFydFwiOiA4LjAsIFwiZW5kXCI6IDEwLjUsIFwidGV4dFwiOiBcIkdsb3ZvLiBZb3Ugb3JkZXIsIHdlIGRlbGl2ZXIuXCJ9XG5dIiwgInRhcmdldF9nZW5kZXIiOiAiZmVtYWxlIiwgInZvaWNlX3Byb3ZpZGVyIjogIkdvb2dsZSIsICJjbG9uZV9vcmlnaW5hbF92b2ljZXMiOiAiRmFsc2UiLCAicHJlZmVycmVkX3ZvaWNlX2ZhbWlseSI6ICJbXSIsICJ2b2ljZXMiOiAie1xuXCJlbi1VU1wiOiBbXCJlbi1VUy1OZXVyYWwyLUhcIiwgXCJlbi1VUy1OZXVyYWwyLUlcIixcImVuLVVTLU5ldXJhbDItSFwiLCBcImVuLVVTLU5ldXJhbDItSVwiXSxcblwiZW4tR0JcIjogW1wiZW4tR0ItTmV1cmFsMi1DXCIsIFwiZW4tR0ItTmV1cmFsMi1CXCIsXCJlbi1HQi1OZXVyYWwyLUNcIiwgXCJlbi1HQi1OZXVyYWwyLUJcIl0sXG5cImVzLUVTXCI6IFtcImVzLUVTLVBvbHlnbG90LTFcIixcImVzLUVTLU5ldXJhbDItQ1wiLFwiZXMtRVMtUG9seWdsb3QtMVwiLFwiZXMtRVMtTmV1cmFsMi1DXCJdXG59XG4iLCAib3V0cHV0X25hbWluZ19jb252ZW50aW9uIjogIm91dHB1dC8yMzA5MjAyNC97Y2FtcGFpZ25fbmFtZX0te2N1c3RvbV90YWd9LWZyb20te29yaWdpbmFsX2xhbmd1YWdlfS10by17dGFyZ2V0X2xhbmd1YWdlfSIsICJvdXRwdXRfYnVja2V0IjogIm15LWFyaWVsLWJ1Y2tldCIsICJzdGF0dXMiOiAiIiwgIm91dHB1dF9maWxlX3BhdGgiOiAiIiwgIm51bWJlcl9vZl9zcGVha2VycyI6ICIxIiwgImRpYXJpemF0aW9uX2luc3RydWN0aW9ucyI6ICIiLCAidHJhbnNsYXRpb25faW5zdHJ1Y3Rpb25zIjogIiIsICJub19kdWJiaW5nX3BocmFzZXMiOiAiW10iLCAibWVyZ2VfdXR0ZXJhbmNlcyI6ICJUcnVlIiwgIm1pbmltdW1fbWVyZ2VfdGhyZXNob2xkIjogIjAuMDAxIiwgImFkanVzdF9zcGVlZCI6ICJUcnVlIiwgInZvY2Fsc192b2x1bWVfYWRqdXN0bWVudCI6ICI1LjAiLCAiYmFja2dyb3VuZF92b2x1bWVfYWRqdXN0bWVudCI6ICIwLjAiLCAiZ2VtaW5pX21vZGVsX25hbWUiOiAiZ2VtaW5pLTEuNS1mbGFzaCIsICJnZW1pbmlfdGVtcGVyYXR1cmUiOiAiMS4wIiwgImdlbWluaV90b3BfcCI6ICIwLjk1IiwgImdlbWluaV90b3BfayI6ICI2NCIsICJnZW1pbmlfbWF4aW11bV9vdXRwdXRfdG9rZW5zIjogIjgxOTIiLCAiY2xlYW5fdXAiOiAiRmFsc2UiLCAid2l0aF92ZXJpZmljYXRpb24iOiAiRmFsc2UiLCAidHRzX3BhcmFtcyI6ICJ7XG4gICAgXCJwaXRjaFwiOiAwLjAsIFwic3BlZWRcIjogMS4wLCBcInZvbHVtZV9nYWluX2RiXCI6IDEwLjBcbn0iLCAicm93X251bSI6IDB9LCAidG9vbF9jb25maWciOiB7IlBST0NFU1NJTkdfRU5EX1BPSU5UX1VSTCI6ICJodHRwczovL3VzLWNlbnRyYWwxLWNvcHljYXQtaGVjdG9yLmNsb3VkZnVuY3Rpb25zLm5ldC9hcmllbC1zcGxpdHRlciIsICJTRVJWSUNFX0FDQ09VTlQiOiAiYXJpZWwtc2FAY29weWNhdC1oZWN0b3IuaWFtLmdzZXJ2aWNlYWNjb3VudC5jb20iLCAiSFVHR0lOR19GQUNFX0FDQ0VTU19UT0tFTiI6ICJoZl9Qa1RXakFFTm1HYmp4T1VJdHlpZmJKTEFqQnBRSHFJR2RuIiwgIkFJX1NUVURJT19BUElfS0VZIjogIkFJemFTeUEzS1lkdmNqdEE1bjlSck9sLWdfZUR0ekJWVjJtVDJjdyIsICJFTEVWRU5fTEFCU19BUElfS0VZIjogInNrXzE3YTkwZDgwOTYzZDMxYTBiMGMyZWE1NGU4ZWI1NTkxYjNhMmI1YzgxYWMwZWUyYyIsICJEVUJCSU5HX0NPTkZJRyI6ICJkdWJiaW5nX2NvbmZpZyJ9LCAic3RhdHVzX2NvbHVtbnMiOiB7IlNUQVRVU19DT0xVTU4iOiAiUCIsICJVUERBVEVEX0FUX0NPTFVNTiI6ICJRIiwgIk1FU1NBR0VfQ09MVU1OIjogIlIifX0="
+          "data": "eyJ3b3Jrc2hlZXRfdXJsIjogImh0dHBzOi8vZG9jcy5nb29nbGUuY29tL3NwcmVhZHNoZWV0cy9kLzFQOGRCM2V4TndQS09DcE1sTmtEU1laVi16WlFFek1mODllNmU3MUdPYmdjIiwgImxpbmVfY29uZmlnIjogeyJyb3dfbnVtIjogMCwgImNhbXBhaWduX25hbWUiOiAidGVzdF9jYW1wYWlnbiIsICJjdXN0b21fdGFnIjogIm11bHRpX3NwZWFrZXJfc2NyaXB0X2dvb2dsZV9tdWx0aV9sYW5ndWFnZSIsICJvcmlnaW5hbF9sYW5ndWFnZSI6ICJlbi1VUyIsICJ0YXJnZXRfbGFuZ3VhZ2UiOiBbImVuLVVTIiwgImVuLUdCIiwgImVzLUVTIl0sICJ2aWRlb191cmwiOiAibXktYXJpZWwtYnVja2V0L3NhbXBsZS9nbG92b2Jhc2V2aWRlby5tcDQiLCAic2NyaXB0IjogW3sic3RhcnQiOiAwLjksICJlbmQiOiAyLjMsICJ0ZXh0IjogIlBpenphIGxvdmVyPyJ9LCB7InN0YXJ0IjogMi41LCAiZW5kIjogNC4wLCAidGV4dCI6ICJEaXNjb3VudHMgbG92ZXI/In0sIHsic3RhcnQiOiA0LjAsICJlbmQiOiA3LjAsICJ0ZXh0IjogIlNhdGlzZnkgeW91ciBmaWVyY2UgcGl6emEgY3JhdmluZyEifSwgeyJzdGFydCI6IDguMCwgImVuZCI6IDEwLjUsICJ0ZXh0IjogIkdsb3ZvLiBZb3Ugb3JkZXIsIHdlIGRlbGl2ZXIuIn1dLCAidGFyZ2V0X2dlbmRlciI6ICJmZW1hbGUiLCAidm9pY2VfcHJvdmlkZXIiOiAiR29vZ2xlIiwgImNsb25lX29yaWdpbmFsX3ZvaWNlcyI6IGZhbHNlLCAicHJlZmVycmVkX3ZvaWNlX2ZhbWlseSI6IFtdLCAidm9pY2VzIjogeyJlbi1VUyI6IFsiZW4tVVMtTmV1cmFsMi1IIiwgImVuLVVTLU5ldXJhbDItSSIsICJlbi1VUy1OZXVyYWwyLUgiLCAiZW4tVVMtTmV1cmFsMi1JIl0sICJlbi1HQiI6IFsiZW4tR0ItTmV1cmFsMi1DIiwgImVuLUdCLU5ldXJhbDItQiIsICJlbi1HQi1OZXVyYWwyLUMiLCAiZW4tR0ItTmV1cmFsMi1CIl0sICJlcy1FUyI6IFsiZXMtRVMtUG9seWdsb3QtMSIsICJlcy1FUy1OZXVyYWwyLUMiLCAiZXMtRVMtUG9seWdsb3QtMSIsICJlcy1FUy1OZXVyYWwyLUMiXX0sICJvdXRwdXRfbmFtaW5nX2NvbnZlbnRpb24iOiAib3V0cHV0LzIzMDkyMDI0L3tjYW1wYWlnbl9uYW1lfS17Y3VzdG9tX3RhZ30tZnJvbS17b3JpZ2luYWxfbGFuZ3VhZ2V9LXRvLXt0YXJnZXRfbGFuZ3VhZ2V9IiwgIm91dHB1dF9idWNrZXQiOiAibXktYXJpZWwtYnVja2V0IiwgInN0YXR1cyI6ICIiLCAib3V0cHV0X2ZpbGVfcGF0aCI6ICIiLCAibnVtYmVyX29mX3NwZWFrZXJzIjogMSwgImRpYXJpemF0aW9uX2luc3RydWN0aW9ucyI6ICIiLCAidHJhbnNsYXRpb25faW5zdHJ1Y3Rpb25zIjogIiIsICJub19kdWJiaW5nX3BocmFzZXMiOiBbXSwgIm1lcmdlX3V0dGVyYW5jZXMiOiB0cnVlLCAibWluaW11bV9tZXJnZV90aHJlc2hvbGQiOiAwLjAwMSwgImFkanVzdF9zcGVlZCI6IHRydWUsICJ2b2NhbHNfdm9sdW1lX2FkanVzdG1lbnQiOiA1LjAsICJiYWNrZ3JvdW5kX3ZvbHVtZV9hZGp1c3RtZW50IjogMC4wLCAiZ2VtaW5pX21vZGVsX25hbWUiOiAiZ2VtaW5pLTEuNS1mbGFzaCIsICJnZW1pbmlfdGVtcGVyYXR1cmUiOiAxLjAsICJnZW1pbmlfdG9wX3AiOiAwLjk1LCAiZ2VtaW5pX3RvcF9rIjogNjQsICJnZW1pbmlfbWF4aW11bV9vdXRwdXRfdG9rZW5zIjogODE5MiwgImNsZWFuX3VwIjogZmFsc2UsICJ3aXRoX3ZlcmlmaWNhdGlvbiI6IGZhbHNlLCAidHRzX3BhcmFtcyI6IHsicGl0Y2giOiAwLjAsICJzcGVlZCI6IDEuMCwgInZvbHVtZV9nYWluX2RiIjogMTAuMH19LCAidG9vbF9jb25maWciOiB7IlBST0NFU1NJTkdfRU5EX1BPSU5UX1VSTCI6ICJodHRwczovL3VzLWNlbnRyYWwxLWNvcHljYXQtaGVjdG9yLmNsb3VkZnVuY3Rpb25zLm5ldC9hcmllbC1zcGxpdHRlciIsICJTRVJWSUNFX0FDQ09VTlQiOiAiYXJpZWwtc2FAY29weWNhdC1oZWN0b3IuaWFtLmdzZXJ2aWNlYWNjb3VudC5jb20iLCAiSFVHR0lOR19GQUNFX0FDQ0VTU19UT0tFTiI6ICJoZl9Qa1RXakFFTm1HYmp4T1VJdHlpZmJKTEFqQnBRSHFJR2RuIiwgIkFJX1NUVURJT19BUElfS0VZIjogIkFJemFTeUEzS1lkdmNqdEE1bjlSck9sLWdfZUR0ekJWVjJtVDJjdyIsICJFTEVWRU5fTEFCU19BUElfS0VZIjogInNrXzE3YTkwZDgwOTYzZDMxYTBiMGMyZWE1NGU4ZWI1NTkxYjNhMmI1YzgxYWMwZWUyYyIsICJEVUJCSU5HX0NPTkZJRyI6ICJkdWJiaW5nX2NvbmZpZyJ9LCAic3RhdHVzX2NvbHVtbnMiOiB7IlNUQVRVU19DT0xVTU4iOiAiUCIsICJVUERBVEVEX0FUX0NPTFVNTiI6ICJRIiwgIk1FU1NBR0VfQ09MVU1OIjogIlIifX0="
           }
       }'
 
@@ -16,22 +16,27 @@
 #
 # -*- coding: utf-8 -*-
 
-import ast
 import base64
-from datetime import datetime
+import dataclasses
 import json
 import os
 import sys
+import time
 import traceback
-from typing import Any
+from typing import Any, Optional
 from ariel.dubbing import Dubber
+import claim_check
 import functions_framework
-import google.auth
 from google.cloud import logging
 from google.cloud import storage
 import gspread
 import pandas as pd
+import row_schema
+import sheets_gateway
+import state_store
+import status_events
 import tensorflow as tf
+import tool_configs
 
 
 VOICE_PROVIDER_ELEVENLABS = "ElevenLabs"
@@ -40,65 +45,48 @@ VOICE_PROVIDER_GOOGLE = "Google"
 STATUS_FAILED = "FAILED"
 STATUS_SUCCESS = "OK"
 
+# Statuses of the claim of a job.
+JOB_RUNNING = "RUNNING"
+JOB_DONE = "DONE"
+
+# Jobs still RUNNING after this many seconds, longer than the timeout of the
+# function, were abandoned and are claimed again.
+JOB_CLAIM_TIMEOUT_SECONDS = 600
+
 sheet_client = None
 
 FAILED_STATUS_FOR_REPORTING = "ERROR_IN_ARIEL_VIDEO_DUBBER"
 CF_NAME = "ariel_video_dubber"
 
-def _update_google_sheet(
-    url: str,
-    worksheet_name: str,
-    row: int,
-    status_columns: dict[str, str],
-    status: str,
-    message: str,
-    client: gspread.Client,
-) -> gspread.Worksheet:
-  """Updates a Google Sheet with the status and message of a processing step.
-
-  Args:
-    url: The URL of the Google Sheet.
-    worksheet_name: The name of the worksheet to update.
-    row: The row number to update.
-    status_columns: A dictionary containing the column letters for
-      'STATUS_COLUMN', 'UPDATED_AT' and 'MESSAGE_COLUMN'.
-    status: The status to write to the sheet (e.g., 'OK', 'FAILED').
-    message: A detailed message about the status, including any errors.
-    client: An authenticated gspread client object.
-
-  Returns:
-    The updated gspread.Worksheet object.
-  """
 
-  current_datetime = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+def _build_file_name(
+    row: row_schema.DubbingRow, language: str, file_name: str
+) -> str:
+  """Builds the file name of a language using the naming convention."""
 
-  sheet = client.open_by_url(url)
-  sheet.worksheet(worksheet_name).update(
-      f"{status_columns['STATUS_COLUMN']}{row}:{status_columns['MESSAGE_COLUMN']}{row}",
-      [[status, current_datetime, message]],
+  path = row.output_naming_convention.format(
+      **{**dataclasses.asdict(row), "target_language": language}
   )
 
-
-def _build_file_name(line_config: pd.DataFrame, file_name: str) -> str:
-  """Builds the file name using the naming convention."""
-
-  path = line_config["output_naming_convention"].format(**line_config)
-
   return f"{path}.{file_name.split('.')[-1]}"
 
 
 def _configure_dubber(
-    tool_config: pd.DataFrame, line_config: pd.DataFrame, output_directory: str
+    tool_config: pd.DataFrame,
+    row: row_schema.DubbingRow,
+    language: str,
+    output_directory: str,
 ) -> Dubber:
   """Configures and initializes a Dubber instance.
 
   This function sets up a Dubber object with configurations from both
-  tool_config and line_config DataFrames. It handles the creation of
+  tool_config and the typed line configuration. It handles the creation of
   the output directory if it doesn't exist.
 
   Args:
     tool_config: DataFrame containing tool-level configurations.
-    line_config: DataFrame containing line-specific configurations.
+    row: The typed line-specific configurations, as parsed by the splitter.
+    language: The target language to dub the line to.
     output_directory: string containing the directory name to save temporary files.
 
   Returns:
@@ -106,8 +94,8 @@ def _configure_dubber(
   """
   dubber = None
 
-  bucket = line_config["video_url"].split("/")[0]
-  file_name = ("/").join(line_config["video_url"].split("/")[1:])
+  bucket = row.video_url.split("/")[0]
+  file_name = ("/").join(row.video_url.split("/")[1:])
 
   if not tf.io.gfile.exists(output_directory):
     tf.io.gfile.makedirs(output_directory)
@@ -119,33 +107,31 @@ def _configure_dubber(
   dubber = Dubber(
       input_file=download_file_path,
       output_directory=output_directory,
-      advertiser_name=line_config["campaign_name"],
-      original_language=line_config["original_language"],
-      target_language=line_config["target_language"],
-      number_of_speakers=int(line_config["number_of_speakers"]),
+      advertiser_name=row.campaign_name,
+      original_language=row.original_language,
+      target_language=language,
+      number_of_speakers=row.number_of_speakers,
       gemini_token=tool_config["AI_STUDIO_API_KEY"],
       hugging_face_token=tool_config["HUGGING_FACE_ACCESS_TOKEN"],
-      no_dubbing_phrases=ast.literal_eval(line_config["no_dubbing_phrases"]),
-      diarization_instructions=line_config["diarization_instructions"],
-      translation_instructions=line_config["translation_instructions"],
-      merge_utterances=line_config["merge_utterances"],
-      minimum_merge_threshold=float(line_config["minimum_merge_threshold"]),
-      preferred_voices=ast.literal_eval(line_config["preferred_voice_family"]),
-      adjust_speed=line_config["adjust_speed"].lower() == "true",
-      vocals_volume_adjustment=float(line_config["vocals_volume_adjustment"]),
-      background_volume_adjustment=float(
-          line_config["background_volume_adjustment"]
-      ),
-      clean_up=line_config["clean_up"],
-      gemini_model_name=line_config["gemini_model_name"],
-      temperature=float(line_config["gemini_temperature"]),
-      top_p=float(line_config["gemini_top_p"]),
-      top_k=int(line_config["gemini_top_k"]),
-      max_output_tokens=int(line_config["gemini_maximum_output_tokens"]),
-      use_elevenlabs=VOICE_PROVIDER_ELEVENLABS in line_config["voice_provider"],
+      no_dubbing_phrases=row.no_dubbing_phrases,
+      diarization_instructions=row.diarization_instructions,
+      translation_instructions=row.translation_instructions,
+      merge_utterances=row.merge_utterances,
+      minimum_merge_threshold=row.minimum_merge_threshold,
+      preferred_voices=row.preferred_voice_family,
+      adjust_speed=row.adjust_speed,
+      vocals_volume_adjustment=row.vocals_volume_adjustment,
+      background_volume_adjustment=row.background_volume_adjustment,
+      clean_up=row.clean_up,
+      gemini_model_name=row.gemini_model_name,
+      temperature=row.gemini_temperature,
+      top_p=row.gemini_top_p,
+      top_k=row.gemini_top_k,
+      max_output_tokens=row.gemini_maximum_output_tokens,
+      use_elevenlabs=VOICE_PROVIDER_ELEVENLABS in row.voice_provider,
       elevenlabs_token=tool_config["ELEVEN_LABS_API_KEY"],
-      elevenlabs_clone_voices=line_config["clone_original_voices"].lower() == "true",
-      with_verification=line_config["with_verification"].lower() == "true",
+      elevenlabs_clone_voices=row.clone_original_voices,
+      with_verification=row.with_verification,
   )
 
   return dubber
@@ -185,47 +171,276 @@ def run(cloud_event: dict[str, Any]) -> tuple[str, int]:
 
   output_directory = os.environ["OUTPUT_DIRECTORY"]
   log_name = os.environ["DEPLOYMENT_NAME"] + CF_NAME
-  msg_data = base64.b64decode(cloud_event.data["message"]["data"]).decode(
-      "utf-8"
-  )
-  request_json = json.loads(msg_data)
-
   try:
+    msg_data = claim_check.check_out(
+        base64.b64decode(cloud_event.data["message"]["data"])
+    ).decode("utf-8")
+    request_json = json.loads(msg_data)
+    store = state_store.from_environment()
+    tool_config = (
+        request_json["tool_config"]
+        if "tool_config" in request_json
+        else tool_configs.load(store, request_json["tool_config_version"])
+    )
     worksheet_url = request_json["worksheet_url"]
-    tool_config = request_json["tool_config"]
-    line_config = request_json["line_config"]
     status_columns = request_json["status_columns"]
+    lines = _message_lines(request_json)
+    rows = [
+        row_schema.DubbingRow.from_dict(line_config)
+        for line_config, _ in lines
+    ]
+  except (ValueError, KeyError) as e:
+    # The message is malformed, or the payload or the tool configuration it
+    # refers to was removed from the state store, e.g. by its lifecycle rule.
+    # Every redelivery would fail the same way, so the message is acked, and
+    # the splitter publishes the line again once it has been PROCESSING for
+    # too long. Other errors, such as a failed read of the state store, are
+    # raised so the message is redelivered.
+    _log_failure(logger, "", e)
+    return "Error", 200
+
+  job_id = request_json.get("job_id") if store else None
+  claim_generation = _claim_job(store, job_id) if job_id else None
+  if job_id and claim_generation is None:
+    print(f"Job {job_id} is already running or done, skipping the message.")
+    return "OK", 200
 
-    sheets_client = _init_google_sheet_client()
+  started_at = time.monotonic()
+  try:
+    if len(rows) > 1:
+      results = _process_coalesced_lines(
+          tool_config, rows, worksheet_url, logger, output_directory
+      )
+    else:
+      results = [
+          _process_line(
+              tool_config, rows[0], worksheet_url, logger, output_directory
+          )
+      ]
+  except Exception as e:
+    # The dubbing failed for good: the job gets the FAILED result like a line
+    # failing in _process_line, and the group decides the status of a line
+    # published per language.
+    traceback.print_exc()
+    results = [(STATUS_FAILED, str(e)) for _ in lines]
 
-    (status, message) = _process_line(
-        tool_config, line_config, worksheet_url, logger, output_directory
+  try:
+    # The result of a group is recorded before the job is DONE, so the
+    # redelivery of the message dubs the language again if it's not.
+    group_result = None
+    if "group" in request_json:
+      (status, message) = results[0]
+      group_result = _record_group_result(
+          store, request_json["group"], status, message
+      )
+    if job_id:
+      _finish_job(store, job_id, claim_generation)
+      job_id = None
+
+    if "group" in request_json:
+      if not group_result:
+        # The other languages of the line are still being dubbed.
+        return "OK", 200
+      results = [group_result]
+
+    dubbing_seconds = round(time.monotonic() - started_at, 3)
+    status_events.report(
+        os.environ["PROJECT_ID"],
+        [
+            status_events.build_event(
+                worksheet_url,
+                tool_config["DUBBING_CONFIG"],
+                status_columns,
+                line_config["row_num"] + 2,
+                status,
+                message,
+                (
+                    message.split(",")
+                    if status == STATUS_SUCCESS and message
+                    else []
+                ),
+                {"dubbing_seconds": dubbing_seconds},
+            )
+            for (line_config, _), (status, message) in zip(lines, results)
+        ],
     )
 
-    _update_google_sheet(
-        worksheet_url,
-        tool_config["DUBBING_CONFIG"],
-        int(line_config["row_num"]) + 2,
-        status_columns,
-        status,
-        message,
-        client=sheets_client,
-    )
+  except Exception:
+    # The result couldn't be recorded or reported. The claim is released and
+    # the error raised, so the message is redelivered and the line dubbed
+    # again.
+    if job_id:
+      store.delete(state_store.job_key(job_id), claim_generation)
+    raise
 
-    return "OK", 200
+  for (_, row_hash), (status, message) in zip(lines, results):
+    if status == STATUS_SUCCESS and row_hash:
+      try:
+        _record_run(store, worksheet_url, row_hash, message)
+      except Exception:
+        # The line is dubbed anyway, it will only be dubbed again next time.
+        traceback.print_exc()
+
+  return "OK", 200
+
+
+def _message_lines(
+    request_json: dict[str, Any],
+) -> list[tuple[dict[str, Any], Optional[str]]]:
+  """Returns the lines of a message.
+
+  Args:
+    request_json: The payload of the message, as built by the splitter.
+
+  Returns:
+    The (line_config, row_hash) tuple of the line of the message, followed by
+    those of the lines coalesced with it, if any.
+  """
+  return [
+      (line["line_config"], line.get("row_hash"))
+      for line in [request_json, *request_json.get("coalesced_lines", [])]
+  ]
+
+
+def _claim_job(store: state_store.StateStore, job_id: str) -> Optional[int]:
+  """Claims a job for the instance, unless it's already running or done.
+
+  The claim is created atomically, so only one of the deliveries of a message
+  is dubbed. A job still RUNNING after JOB_CLAIM_TIMEOUT_SECONDS was left by
+  an instance stopped before finishing it, and is claimed again by replacing
+  the claim only if it's still the one read, so a single delivery takes it
+  over.
+
+  Args:
+    store: The state store holding the claims of the jobs.
+    job_id: The ID of the job, set by the splitter.
+
+  Returns:
+    The generation of the claim if the instance claimed the job and must dub
+    it, None otherwise.
+  """
+  key = state_store.job_key(job_id)
+  claim = bytes(
+      json.dumps({"status": JOB_RUNNING, "claimed_at": time.time()}), "utf-8"
+  )
+  generation = store.replace(key, claim, 0)
+  if generation is not None:
+    return generation
+
+  data, previous_generation = store.read_generation(key)
+  previous_claim = json.loads(data or "{}")
+  if not previous_claim or (
+      previous_claim.get("status") == JOB_RUNNING
+      and time.time() - previous_claim.get("claimed_at", 0)
+      > JOB_CLAIM_TIMEOUT_SECONDS
+  ):
+    return store.replace(key, claim, previous_generation)
+  return None
+
+
+def _finish_job(
+    store: state_store.StateStore, job_id: str, generation: int
+) -> None:
+  """Marks a claimed job as DONE, so its redeliveries are skipped.
+
+  The claim is left as it is if another delivery took the job over in the
+  meantime.
+
+  Args:
+    store: The state store holding the claims of the jobs.
+    job_id: The ID of the job, set by the splitter.
+    generation: The generation of the claim, as returned by _claim_job.
+  """
+  store.replace(
+      state_store.job_key(job_id),
+      bytes(json.dumps({"status": JOB_DONE, "done_at": time.time()}), "utf-8"),
+      generation,
+  )
+
+
+def _record_group_result(
+    store: state_store.StateStore,
+    group: dict[str, Any],
+    status: str,
+    message: str,
+) -> Optional[tuple[str, str]]:
+  """Records the result of a language of a line published per language.
+
+  Args:
+    store: The state store holding the results of the group.
+    group: The group of the message, with its "id", the "language" of the
+      message and the "languages" of the line, in the order of the sheet.
+    status: The status of the dubbing of the language.
+    message: The GCS path of the dubbed file, or the error message.
+
+  Returns:
+    None while some languages of the line are still being dubbed. Once all
+    are, a tuple of string with the status of the line, OK if every language
+    succeeded, and string with the comma-separated GCS paths of the dubbed
+    files or the error message of every failed language.
+  """
+  prefix = state_store.group_prefix(group["id"])
+  store.write(
+      prefix + group["language"],
+      b"",
+      metadata={"status": status, "message": message},
+  )
+
+  results = {
+      key[len(prefix) :]: metadata for key, metadata in store.list(prefix)
+  }
+  if any(language not in results for language in group["languages"]):
+    return None
+
+  failed = [
+      f"{language}: {results[language].get('message', '')}"
+      for language in group["languages"]
+      if results[language].get("status") != STATUS_SUCCESS
+  ]
+  if failed:
+    return (STATUS_FAILED, "; ".join(failed))
+  return (
+      STATUS_SUCCESS,
+      ",".join(
+          results[language]["message"]
+          for language in group["languages"]
+          if results[language].get("message")
+      ),
+  )
+
+
+def _record_run(
+    store: Optional[state_store.StateStore],
+    worksheet_url: str,
+    row_hash: str,
+    output_file_path: str,
+):
+  """Adds a successful run to the run index of the spreadsheet.
+
+  The splitter skips the lines whose content hash is in the run index and
+  writes back the output of the run instead.
+
+  Args:
+    store: The state store holding the run index, or None if there is none.
+    worksheet_url: The URL of the Google Sheet containing the configuration.
+    row_hash: The content hash of the line, computed by the splitter.
+    output_file_path: The comma-separated GCS paths of the dubbed files.
+  """
+  if not store:
+    return
+
+  store.write(
+      state_store.run_index_prefix(
+          gspread.utils.extract_id_from_url(worksheet_url)
+      )
+      + row_hash,
+      b"",
+      metadata={
+          "output_file_path": output_file_path,
+          "updated_at": sheets_gateway.now(),
+      },
+  )
 
-  except Exception as e:
-    traceback.print_exc()
-    _update_google_sheet(
-        worksheet_url,
-        tool_config["DUBBING_CONFIG"],
-        int(line_config["row_num"]) + 2,
-        status_columns,
-        status,
-        str(e),
-        client=sheets_client,
-    )
-    return "Error", 500
 
 def _dub_ad_from_script_elevenlabs(
     dubber: Dubber,
@@ -282,7 +497,7 @@ def _dub_ad_from_script_google(
 
 def _process_line(
     tool_config: pd.DataFrame,
-    line_config: dict[str, Any],
+    row: row_schema.DubbingRow,
     worksheet_url: str,
     logger: logging.Logger,
     output_directory: str
@@ -297,7 +512,7 @@ def _process_line(
 
   Args:
     tool_config: DataFrame containing tool-level configurations.
-    line_config: dict containing line-specific configurations.
+    row: The typed line-specific configurations, as parsed by the splitter.
     worksheet_url: The URL of the Google Sheet containing the configuration.
     logger: logging.Logger object for logging events and errors.
     output_directory: string containing the directory path to store temporary files.
@@ -311,68 +526,51 @@ def _process_line(
 
   try:
 
-    line_config["script"] = ast.literal_eval(line_config["script"])
-    voices = json.loads(line_config["voices"])
-
-    target_languages = ast.literal_eval(line_config["target_language"])
-
-    for language in target_languages:
+    for language in row.target_language:
       status = STATUS_SUCCESS
       message = ""
-      line_config["target_language"] = language
 
-      if line_config["script"]:
-        dubber = _configure_dubber(tool_config, line_config, output_directory)
+      if row.script:
+        dubber = _configure_dubber(
+            tool_config, row, language, output_directory
+        )
 
         if dubber.use_elevenlabs:
           _dub_ad_from_script_elevenlabs(dubber,
-                                         line_config["script"],
-                                         json.loads(line_config["tts_params"]),
-                                         voices[line_config["target_language"]])
+                                         row.script,
+                                         row.tts_params,
+                                         row.voices[language])
         else:
           _dub_ad_from_script_google(dubber,
-                                         line_config["script"],
-                                         json.loads(line_config["tts_params"]),
-                                         voices[line_config["target_language"]])
+                                         row.script,
+                                         row.tts_params,
+                                         row.voices[language])
 
         dubbed_file_name = dubber.postprocessing_output.video_file
-        output_file_name = _build_file_name(line_config, dubbed_file_name)
+        output_file_name = _build_file_name(row, language, dubbed_file_name)
         output_files_paths.append(
             _upload_file_to_gcs(
-                line_config["output_bucket"], dubbed_file_name, output_file_name
+                row.output_bucket, dubbed_file_name, output_file_name
             )
         )
 
       else:
 
-        dubber = _configure_dubber(tool_config, line_config, output_directory)
+        dubber = _configure_dubber(
+            tool_config, row, language, output_directory
+        )
         dubber.dub_ad()
         dubbed_file_name = dubber.postprocessing_output.video_file
-        output_file_name = _build_file_name(line_config, dubbed_file_name)
+        output_file_name = _build_file_name(row, language, dubbed_file_name)
         output_files_paths.append(
             _upload_file_to_gcs(
-                line_config["output_bucket"], dubbed_file_name, output_file_name
+                row.output_bucket, dubbed_file_name, output_file_name
             )
         )
 
   except Exception as e:
-    traceback.print_exc()
-    logger.log(str(e))
-    logging_payload = {
-        "worksheet_url": worksheet_url if worksheet_url else None,
-        "status": FAILED_STATUS_FOR_REPORTING,
-        "message": (
-            str(e)
-            if len(str(e)) > 1
-            else "Check you shared the spreadsheet with the service account"
-        ),
-        "success": False,
-    }
-    logger.log_text(
-        f"{FAILED_STATUS_FOR_REPORTING}: {json.dumps(logging_payload)}"
-    )
     status = STATUS_FAILED
-    message = logging_payload["message"]
+    message = _log_failure(logger, worksheet_url, e)
 
   finally:
 
@@ -389,25 +587,115 @@ def _process_line(
   )
 
 
-def _init_google_sheet_client() -> gspread.Client:
-  """Initializes and authenticates a gspread client.
+def _process_coalesced_lines(
+    tool_config: pd.DataFrame,
+    rows: list[row_schema.DubbingRow],
+    worksheet_url: str,
+    logger: logging.Logger,
+    output_directory: str,
+) -> list[tuple[str, str]]:
+  """Dubs the lines coalesced by the splitter with a single Dubber.
 
-  This function sets up the necessary credentials and authorization
-  to interact with Google Sheets using the gspread library.
+  The lines share their video and every setting of the dubbing, so the video
+  is prepared and transcribed once, for the first language, and every other
+  language reuses the transcription (see
+  Dubber.dub_ad_with_different_language). Every language is dubbed once, and
+  uploaded with the naming convention of every line dubbing it.
+
+  Args:
+    tool_config: DataFrame containing tool-level configurations.
+    rows: The typed configurations of the lines, as parsed by the splitter.
+    worksheet_url: The URL of the Google Sheet containing the configuration.
+    logger: logging.Logger object for logging events and errors.
+    output_directory: string containing the directory path to store temporary
+      files.
 
   Returns:
-    A gspread.Client object authorized to access Google Sheets.
+    The (status, message) tuple of every line, as returned by _process_line.
   """
-  scopes = [
-      "https://www.googleapis.com/auth/spreadsheets",
-      "https://www.googleapis.com/auth/drive",
-      "https://spreadsheets.google.com/feeds",
-  ]
+  languages = list(
+      dict.fromkeys(
+          language for row in rows for language in row.target_language
+      )
+  )
+  dubbed_files = {}
+  try:
+    # The intermediate files of the first language are needed by the others,
+    # the directory is only cleaned up once every language is dubbed.
+    dubber = _configure_dubber(
+        tool_config,
+        dataclasses.replace(rows[0], clean_up=False),
+        languages[0],
+        output_directory,
+    )
+    dubbed_files[languages[0]] = dubber.dub_ad().video_file
+  except Exception as e:
+    message = _log_failure(logger, worksheet_url, e)
+    return [(STATUS_FAILED, message)] * len(rows)
+
+  for language in languages[1:]:
+    try:
+      dubbed_files[language] = dubber.dub_ad_with_different_language(
+          language
+      ).video_file
+    except Exception as e:
+      dubbed_files[language] = e
+
+  results = []
+  for row in rows:
+    try:
+      output_files_paths = []
+      for language in row.target_language:
+        if isinstance(dubbed_files[language], Exception):
+          raise dubbed_files[language]
+        output_files_paths.append(
+            _upload_file_to_gcs(
+                row.output_bucket,
+                dubbed_files[language],
+                _build_file_name(row, language, dubbed_files[language]),
+            )
+        )
+      results.append((STATUS_SUCCESS, ",".join(output_files_paths)))
+    except Exception as e:
+      results.append((STATUS_FAILED, _log_failure(logger, worksheet_url, e)))
+
+  if any(row.clean_up for row in rows):
+    try:
+      dubber.run_clean_directory()
+    except Exception:
+      traceback.print_exc()
+  return results
+
 
-  credentials, _ = google.auth.default(scopes=scopes)
-  client = gspread.authorize(credentials)
+def _log_failure(
+    logger: logging.Logger, worksheet_url: str, error: Exception
+) -> str:
+  """Logs the failure to dub a line.
 
-  return client
+  Args:
+    logger: logging.Logger object for logging events and errors.
+    worksheet_url: The URL of the Google Sheet containing the configuration.
+    error: The exception raised while dubbing the line.
+
+  Returns:
+    The message to report for the line.
+  """
+  traceback.print_exc()
+  logger.log(str(error))
+  logging_payload = {
+      "worksheet_url": worksheet_url if worksheet_url else None,
+      "status": FAILED_STATUS_FOR_REPORTING,
+      "message": (
+          str(error)
+          if len(str(error)) > 1
+          else "Check you shared the spreadsheet with the service account"
+      ),
+      "success": False,
+  }
+  logger.log_text(
+      f"{FAILED_STATUS_FOR_REPORTING}: {json.dumps(logging_payload)}"
+  )
+  return logging_payload["message"]
 
 
 def _upload_file_to_gcs(
@@ -21,6 +21,7 @@ export REGION="us-central1"
 export SERVICE_ACCOUNT="<SET_SA_HERE>"
 export PUBSUB_TOPIC="ariel_dub_video"
 export OUTPUT_DIRECTORY="./tmp"
+export STATE_STORE_URI="/tmp/ariel_state"
 #cp -R ../../lib ./
 
 functions-framework --target=run
\ No newline at end of file
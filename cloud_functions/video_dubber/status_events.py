@@ -0,0 +1 @@
+../common/status_events.py
\ No newline at end of file
@@ -0,0 +1 @@
+../common/tool_configs.py
\ No newline at end of file
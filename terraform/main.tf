@@ -80,6 +80,34 @@ resource "google_project_service" "enable_iam_credentials" {
   disable_on_destroy         = false
 }
 
+resource "google_project_service" "enable_cloudscheduler_api" {
+  project                    = var.PROJECT_ID
+  service                    = "cloudscheduler.googleapis.com"
+  disable_dependent_services = true
+  disable_on_destroy         = false
+}
+
+resource "google_project_service" "enable_monitoring_api" {
+  project                    = var.PROJECT_ID
+  service                    = "monitoring.googleapis.com"
+  disable_dependent_services = true
+  disable_on_destroy         = false
+}
+
+resource "google_project_service" "enable_secretmanager_api" {
+  project                    = var.PROJECT_ID
+  service                    = "secretmanager.googleapis.com"
+  disable_dependent_services = true
+  disable_on_destroy         = false
+}
+
+resource "google_project_service" "enable_cloudtasks_api" {
+  project                    = var.PROJECT_ID
+  service                    = "cloudtasks.googleapis.com"
+  disable_dependent_services = true
+  disable_on_destroy         = false
+}
+
 resource "google_project_service" "enable_appengine_api" {
   project                    = var.PROJECT_ID
   service                    = "appengine.googleapis.com"
@@ -148,6 +176,35 @@ resource "google_project_iam_member" "storage-admin" {
   role    = "roles/storage.admin"
   member  = "serviceAccount:${google_service_account.sa.email}"
 }
+# API keys of the tool configurations, written by the splitter and read by the
+# video dubbers. The splitter only creates secrets and adds their first version,
+# checking it exists when another instance created the secret.
+resource "google_project_iam_custom_role" "secret-writer" {
+  project     = var.PROJECT_ID
+  role_id     = "${replace(var.DEPLOYMENT_NAME, "-", "_")}_secret_writer"
+  title       = "${var.DEPLOYMENT_NAME} secret writer"
+  permissions = [
+    "secretmanager.secrets.create",
+    "secretmanager.versions.add",
+    "secretmanager.versions.get",
+  ]
+}
+resource "google_project_iam_member" "secret-writer" {
+  project  = var.PROJECT_ID
+  role    = google_project_iam_custom_role.secret-writer.name
+  member  = "serviceAccount:${google_service_account.sa.email}"
+}
+resource "google_project_iam_member" "secret-accessor" {
+  project  = var.PROJECT_ID
+  role    = "roles/secretmanager.secretAccessor"
+  member  = "serviceAccount:${google_service_account.sa.email}"
+}
+# The splitter schedules the re-runs publishing the lines it deferred.
+resource "google_project_iam_member" "cloud-tasks-enqueuer" {
+  project  = var.PROJECT_ID
+  role    = "roles/cloudtasks.enqueuer"
+  member  = "serviceAccount:${google_service_account.sa.email}"
+}
 resource "google_project_iam_member" "artifact-registry-writer" {
   project  = var.PROJECT_ID
   role    = "roles/artifactregistry.writer"
@@ -195,6 +252,26 @@ resource "google_storage_bucket" "ariel_build_bucket" {
   }
 }
 
+resource "google_storage_bucket" "ariel_state_bucket" {
+  project                     = var.PROJECT_ID
+  name                        = "${var.PROJECT_ID}-${var.DEPLOYMENT_NAME}-${var.STATE_GCS_BUCKET}"
+  location                    = var.LOCATION
+  force_destroy               = true
+  uniform_bucket_level_access = true
+
+  # Claim checked messages sent to the video dubbers, results of the lines
+  # dubbed per language and claims of the jobs.
+  lifecycle_rule {
+    condition {
+      age            = 7
+      matches_prefix = ["payloads/", "groups/", "jobs/", "locks/"]
+    }
+    action {
+      type = "Delete"
+    }
+  }
+}
+
 resource "time_sleep" "wait_60s" {
   create_duration = "60s"
 
@@ -211,6 +288,26 @@ resource "google_pubsub_topic" "ariel_topic" {
   message_retention_duration = "86600s"
 }
 
+resource "google_pubsub_topic" "ariel_script_topic" {
+  project = var.PROJECT_ID
+  name = "${var.DEPLOYMENT_NAME}-${var.SCRIPT_PUBSUB_TOPIC}"
+  message_retention_duration = "86600s"
+}
+
+resource "google_pubsub_topic" "ariel_status_topic" {
+  project = var.PROJECT_ID
+  name = "${var.DEPLOYMENT_NAME}-${var.STATUS_PUBSUB_TOPIC}"
+  message_retention_duration = "86600s"
+}
+
+resource "google_pubsub_subscription" "ariel_status_subscription" {
+  project = var.PROJECT_ID
+  name    = "${var.DEPLOYMENT_NAME}-${var.STATUS_PUBSUB_TOPIC}-aggregator"
+  topic   = google_pubsub_topic.ariel_status_topic.id
+  ack_deadline_seconds       = 120
+  message_retention_duration = "86600s"
+}
+
 output PROJECT_NUMBER {
   value =  var.PROJECT_NUMBER
   depends_on = [ google_cloudfunctions2_function.video_dubber ]
@@ -95,6 +95,16 @@ resource "google_cloudfunctions2_function" "splitter" {
       SERVICE_ACCOUNT = google_service_account.sa.email
       REGION          = var.REGION
       PUBSUB_TOPIC    = google_pubsub_topic.ariel_topic.name
+      SCRIPT_PUBSUB_TOPIC = google_pubsub_topic.ariel_script_topic.name
+      STATE_STORE_URI = "gs://${google_storage_bucket.ariel_state_bucket.name}"
+      DUBBER_TIMEOUT_SECONDS = google_cloudfunctions2_function.video_dubber.service_config[0].timeout_seconds
+      GEMINI_TOKENS_PER_MINUTE = var.GEMINI_TOKENS_PER_MINUTE
+      GOOGLE_TTS_CHARACTERS_PER_MINUTE = var.GOOGLE_TTS_CHARACTERS_PER_MINUTE
+      ELEVENLABS_CHARACTERS_PER_MINUTE = var.ELEVENLABS_CHARACTERS_PER_MINUTE
+      DUBBER_SUBSCRIPTIONS = var.DUBBER_SUBSCRIPTIONS
+      RERUN_QUEUE = google_cloud_tasks_queue.splitter_rerun_queue.id
+      # The URL of the function, which can't refer to its own url attribute.
+      SPLITTER_URL = "https://${var.REGION}-${var.PROJECT_ID}.cloudfunctions.net/${var.DEPLOYMENT_NAME}-splitter"
     }
     all_traffic_on_latest_revision = true
     service_account_email          = google_service_account.sa.email
@@ -105,4 +115,19 @@ resource "google_cloudfunctions2_function" "splitter" {
       build_config[0].source[0].storage_source[0].generation
     ]
   }
-}
\ No newline at end of file
+}
+
+# Re-runs of the splitter publishing the lines deferred by the pacing of a
+# run. A re-run finding the sheet locked by another run is retried.
+resource "google_cloud_tasks_queue" "splitter_rerun_queue" {
+  project  = var.PROJECT_ID
+  name     = "${var.DEPLOYMENT_NAME}-splitter-reruns"
+  location = var.REGION
+  depends_on = [google_project_service.enable_cloudtasks_api]
+
+  retry_config {
+    max_attempts  = 5
+    min_backoff   = "60s"
+    max_backoff   = "600s"
+  }
+}
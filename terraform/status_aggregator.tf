@@ -0,0 +1,132 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+resource "google_cloud_run_v2_service_iam_binding" "status_aggregator_cf_cr_binding" {
+  location = google_cloudfunctions2_function.status_aggregator.location
+  project  = google_cloudfunctions2_function.status_aggregator.project
+  name     = google_cloudfunctions2_function.status_aggregator.name
+  role     = "roles/run.invoker"
+  members = [
+    "serviceAccount:${google_service_account.sa.email}",
+    "serviceAccount:${var.PROJECT_NUMBER}-compute@developer.gserviceaccount.com"
+    ]
+}
+
+resource "google_cloud_run_v2_service_iam_binding" "status_aggregator_cf_srva_binding" {
+  location = google_cloudfunctions2_function.status_aggregator.location
+  project  = google_cloudfunctions2_function.status_aggregator.project
+  name     = google_cloudfunctions2_function.status_aggregator.name
+  role     = "roles/cloudfunctions.serviceAgent"
+  members = [
+    "serviceAccount:${google_service_account.sa.email}",
+    "serviceAccount:${var.PROJECT_NUMBER}-compute@developer.gserviceaccount.com"
+  ]
+}
+
+data "archive_file" "status_aggregator_archive" {
+  type        = "zip"
+  output_path = ".temp/status_aggregator_code_source.zip"
+  source_dir  = "${path.module}/../cloud_functions/status_aggregator/"
+
+  depends_on = [ google_storage_bucket.ariel_build_bucket,
+  #null_resource.add_ariel_lib
+  ]
+}
+
+resource "google_storage_bucket_object" "status_aggregator_object" {
+  name       = "${var.DEPLOYMENT_NAME}-status-aggregator-${data.archive_file.status_aggregator_archive.output_sha256}.zip"
+  bucket     = google_storage_bucket.ariel_build_bucket.name
+  source     = data.archive_file.status_aggregator_archive.output_path
+  depends_on = [data.archive_file.status_aggregator_archive,
+  #null_resource.add_ariel_lib
+  ]
+  lifecycle {
+    replace_triggered_by = [
+      #null_resource.add_ariel_lib
+    ]
+  }
+}
+
+resource "google_cloudfunctions2_function" "status_aggregator" {
+  name        = "${var.DEPLOYMENT_NAME}-status-aggregator"
+  description = "It writes the status events of the video dubbers to the google sheets in batches"
+  project     = var.PROJECT_ID
+  location    = var.REGION
+  depends_on = [ #null_resource.clone_ariel_repo,
+  google_storage_bucket.ariel_build_bucket,
+  #null_resource.add_ariel_lib,
+  google_storage_bucket_object.status_aggregator_object,
+  time_sleep.wait_60s]
+
+  build_config {
+    runtime     = "python310"
+    entry_point = "run" # Set the entry point
+    service_account = google_service_account.sa.name
+    environment_variables = {
+      BUILD_CONFIG_TEST = "build_test"
+    }
+    source {
+      storage_source {
+        bucket = google_storage_bucket.ariel_build_bucket.name
+        object = google_storage_bucket_object.status_aggregator_object.name
+      }
+    }
+  }
+
+  service_config {
+    min_instance_count = 0
+    max_instance_count = 1
+    available_cpu = 1
+    available_memory   = "512Mi"
+    timeout_seconds    = 120
+    environment_variables = {
+      PROJECT_ID      = var.PROJECT_ID
+      DEPLOYMENT_NAME = var.DEPLOYMENT_NAME
+      SERVICE_ACCOUNT = google_service_account.sa.email
+      REGION          = var.REGION
+      STATUS_SUBSCRIPTION = google_pubsub_subscription.ariel_status_subscription.name
+    }
+    all_traffic_on_latest_revision = true
+    service_account_email          = google_service_account.sa.email
+  }
+  lifecycle {
+    ignore_changes = [
+      # Ignore changes to generation
+      build_config[0].source[0].storage_source[0].generation
+    ]
+  }
+}
+
+resource "google_cloud_scheduler_job" "status_aggregator_job" {
+  project     = var.PROJECT_ID
+  region      = var.REGION
+  name        = "${var.DEPLOYMENT_NAME}-status-aggregator"
+  description = "It runs the status aggregator every minute"
+  schedule    = "* * * * *"
+  attempt_deadline = "120s"
+  depends_on = [google_project_service.enable_cloudscheduler_api]
+
+  http_target {
+    http_method = "POST"
+    uri         = google_cloudfunctions2_function.status_aggregator.url
+    body        = base64encode("{}")
+    headers = {
+      "Content-Type" = "application/json"
+    }
+    oidc_token {
+      service_account_email = google_service_account.sa.email
+      audience              = google_cloudfunctions2_function.status_aggregator.url
+    }
+  }
+}
@@ -51,6 +51,12 @@ variable "BUILD_GCS_BUCKET" {
   default     = "build"
 }
 
+variable "STATE_GCS_BUCKET" {
+  type        = string
+  description = "Cloud Storage bucket for the state shared by the cloud functions."
+  default     = "state"
+}
+
 variable "USER_LIST" {
   type = string
   description = "The list of users email to grant access to ariel separated by comma"
@@ -68,3 +74,52 @@ variable "PUBSUB_TOPIC" {
   description = "The topic to communicate splitter with video dubber"
   default = "dub_video"
 }
+
+
+variable "SCRIPT_PUBSUB_TOPIC" {
+  type = string
+  description = "The topic to communicate splitter with the video dubber of the lines with a script"
+  default = "dub_script"
+}
+
+variable "VIDEO_DUBBER_MAX_INSTANCES" {
+  type = number
+  description = "Maximum number of video dubber instances dubbing lines from their video"
+  default = 100
+}
+
+variable "SCRIPT_VIDEO_DUBBER_MAX_INSTANCES" {
+  type = number
+  description = "Maximum number of video dubber instances dubbing lines from their script"
+  default = 100
+}
+
+variable "STATUS_PUBSUB_TOPIC" {
+  type = string
+  description = "The topic to send the video dubber status events to the status aggregator"
+  default = "status_events"
+}
+
+variable "GEMINI_TOKENS_PER_MINUTE" {
+  type = number
+  description = "Gemini tokens per minute the splitter paces the dubbed lines to, 0 for no limit"
+  default = 4000000
+}
+
+variable "GOOGLE_TTS_CHARACTERS_PER_MINUTE" {
+  type = number
+  description = "Google Text-to-Speech characters per minute the splitter paces the dubbed lines to, 0 for no limit"
+  default = 1000000
+}
+
+variable "ELEVENLABS_CHARACTERS_PER_MINUTE" {
+  type = number
+  description = "ElevenLabs characters per minute the splitter paces the dubbed lines to, 0 for no limit"
+  default = 100000
+}
+
+variable "DUBBER_SUBSCRIPTIONS" {
+  type = string
+  description = "Comma-separated IDs of the subscriptions of the video dubbers, whose backlog the splitter paces the dubbed lines to"
+  default = ""
+}
@@ -84,6 +84,7 @@ resource "google_cloudfunctions2_function" "video_dubber" {
 
   service_config {
     min_instance_count = 0
+    max_instance_count = var.VIDEO_DUBBER_MAX_INSTANCES
     available_cpu = 8
     available_memory   = "16Gi"
     timeout_seconds    = 540
@@ -93,6 +94,8 @@ resource "google_cloudfunctions2_function" "video_dubber" {
       SERVICE_ACCOUNT = google_service_account.sa.email
       REGION          = var.REGION
       OUTPUT_DIRECTORY  = var.OUTPUT_DIRECTORY
+      STATE_STORE_URI = "gs://${google_storage_bucket.ariel_state_bucket.name}"
+      STATUS_TOPIC    = google_pubsub_topic.ariel_status_topic.name
     }
     all_traffic_on_latest_revision = true
     service_account_email          = google_service_account.sa.email
@@ -111,4 +114,84 @@ resource "google_cloudfunctions2_function" "video_dubber" {
       build_config[0].source[0].storage_source[0].generation
     ]
   }
-}
\ No newline at end of file
+}
+
+resource "google_cloud_run_v2_service_iam_binding" "script_video_dubber_cf_cr_binding" {
+  location = google_cloudfunctions2_function.script_video_dubber.location
+  project  = google_cloudfunctions2_function.script_video_dubber.project
+  name     = google_cloudfunctions2_function.script_video_dubber.name
+  role     = "roles/run.invoker"
+  members = [
+    "serviceAccount:${google_service_account.sa.email}",
+    "serviceAccount:${var.PROJECT_NUMBER}-compute@developer.gserviceaccount.com"
+    ]
+}
+
+resource "google_cloud_run_v2_service_iam_binding" "script_video_dubber_cf_srva_binding" {
+  location = google_cloudfunctions2_function.script_video_dubber.location
+  project  = google_cloudfunctions2_function.script_video_dubber.project
+  name     = google_cloudfunctions2_function.script_video_dubber.name
+  role     = "roles/cloudfunctions.serviceAgent"
+  members = [
+    "serviceAccount:${google_service_account.sa.email}",
+    "serviceAccount:${var.PROJECT_NUMBER}-compute@developer.gserviceaccount.com"
+  ]
+}
+
+resource "google_cloudfunctions2_function" "script_video_dubber" {
+  name        = "${var.DEPLOYMENT_NAME}-script-video-dubber"
+  description = "It runs a ariel execution for the lines dubbed from a script, so they never wait behind the lines dubbed from the video"
+  project     = var.PROJECT_ID
+  location    = var.REGION
+  depends_on = [google_storage_bucket.ariel_build_bucket,
+  google_storage_bucket_object.video_dubber_object,
+  time_sleep.wait_60s]
+
+  build_config {
+    runtime     = "python310"
+    entry_point = "run" # Set the entry point
+    service_account = google_service_account.sa.name
+    environment_variables = {
+      BUILD_CONFIG_TEST = "build_test"
+    }
+    source {
+      storage_source {
+        bucket = google_storage_bucket.ariel_build_bucket.name
+        object = google_storage_bucket_object.video_dubber_object.name
+      }
+    }
+  }
+
+  service_config {
+    min_instance_count = 0
+    max_instance_count = var.SCRIPT_VIDEO_DUBBER_MAX_INSTANCES
+    available_cpu = 8
+    available_memory   = "16Gi"
+    timeout_seconds    = 540
+    environment_variables = {
+      PROJECT_ID      = var.PROJECT_ID
+      DEPLOYMENT_NAME = var.DEPLOYMENT_NAME
+      SERVICE_ACCOUNT = google_service_account.sa.email
+      REGION          = var.REGION
+      OUTPUT_DIRECTORY  = var.OUTPUT_DIRECTORY
+      STATE_STORE_URI = "gs://${google_storage_bucket.ariel_state_bucket.name}"
+      STATUS_TOPIC    = google_pubsub_topic.ariel_status_topic.name
+    }
+    all_traffic_on_latest_revision = true
+    service_account_email          = google_service_account.sa.email
+  }
+
+  event_trigger {
+    trigger_region = var.REGION
+    event_type     = "google.cloud.pubsub.topic.v1.messagePublished"
+    pubsub_topic   = google_pubsub_topic.ariel_script_topic.id
+    retry_policy   = "RETRY_POLICY_RETRY"
+  }
+
+  lifecycle {
+    ignore_changes = [
+      # Ignore changes to generation
+      build_config[0].source[0].storage_source[0].generation
+    ]
+  }
+}